@@ -0,0 +1,303 @@
+"""Benchmarks of sphinxcontrib-redoc on synthetic OpenAPI specs.
+
+Every case is built by Sphinx in a separate process, so peak memory of one
+case doesn't affect others. Results are printed as JSON, and can be compared
+with results of a previous run::
+
+    $ python benchmarks/bench.py --sizes 100,1000 --output before.json
+    $ python benchmarks/bench.py --sizes 100,1000 --compare before.json
+
+The comparison exits with non zero status if any metric got worse than the
+threshold allows.
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import sphinx
+import yaml
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+METRICS = ('render_seconds', 'assets_seconds', 'peak_rss_bytes',
+           'output_bytes')
+
+# Timings are too noisy to be compared when they differ by less than that.
+NOISE_SECONDS = 0.01
+
+
+def generate_spec(operations, depth):
+    """Return OpenAPI spec with a given number of operations.
+
+    Every operation refers to a schema, which refers to another schema and
+    so on, *depth* schemas deep.
+    """
+    schemas = {}
+    for level in range(depth):
+        schema = {
+            'type': 'object',
+            'description': 'Schema of level %d.' % level,
+            'properties': {
+                'id': {'type': 'integer', 'format': 'int64'},
+                'name': {'type': 'string', 'example': 'Name </script>'},
+            },
+        }
+        if level + 1 < depth:
+            schema['properties']['child'] = {
+                '$ref': '#/components/schemas/Level%d' % (level + 1)}
+        schemas['Level%d' % level] = schema
+
+    paths = {}
+    for i in range(operations):
+        path = paths.setdefault('/resources/%d/{id}' % (i // 4), {})
+        path[('get', 'put', 'post', 'delete')[i % 4]] = {
+            'operationId': 'operation%d' % i,
+            'summary': 'Operation %d' % i,
+            'tags': ['tag%d' % (i % 50)],
+            'parameters': [
+                {'name': 'id', 'in': 'path', 'required': True,
+                 'schema': {'type': 'integer'}},
+            ],
+            'responses': {
+                '200': {
+                    'description': 'OK',
+                    'content': {'application/json': {'schema': {
+                        '$ref': '#/components/schemas/Level0'}}},
+                },
+            },
+        }
+
+    return {
+        'openapi': '3.0.0',
+        'info': {'title': 'Synthetic API', 'version': '1.0'},
+        'tags': [{'name': 'tag%d' % i} for i in range(min(operations, 50))],
+        'paths': paths,
+        'components': {'schemas': schemas},
+    }
+
+
+def run_case(case):
+    """Build a Sphinx project for a given case, and return its metrics."""
+    from sphinx.application import Sphinx
+    from sphinxcontrib import redoc
+
+    timings = {'render_seconds': 0.0, 'assets_seconds': 0.0}
+
+    def timed(name, func):
+        def wrapper(*args, **kwargs):
+            started = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[name] += time.time() - started
+        return wrapper
+
+    def render(app, render=redoc.render):
+        # Only time spent in the extension is measured, not time spent by
+        # Sphinx to write pages.
+        pages = render(app)
+        step = timed('render_seconds', lambda: next(pages, None))
+        for page in iter(step, None):
+            yield page
+
+    # Sphinx looks up the event handlers when the extension is set up, so
+    # they can be replaced beforehand.
+    redoc.render = render
+    redoc.assets = timed('assets_seconds', redoc.assets)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        src = os.path.join(workdir, 'src')
+        out = os.path.join(workdir, 'out')
+        os.makedirs(src)
+
+        with io.open(os.path.join(src, 'index.rst'), 'w') as f:
+            f.write(u'Benchmark\n=========\n')
+
+        spec = generate_spec(case['operations'], case['depth'])
+        dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+        with io.open(os.path.join(src, 'spec.yml'), 'w',
+                     encoding='utf-8') as f:
+            yaml.dump(spec, f, Dumper=dumper)
+        del spec
+
+        conf = []
+        for entry in range(case['entries']):
+            conf.append({
+                'name': 'API %d' % entry,
+                'page': 'api/%d' % entry,
+                'spec': 'spec.yml',
+                'embed': case['mode'] == 'embed',
+            })
+
+        app = Sphinx(
+            srcdir=src,
+            confdir=None,
+            outdir=out,
+            doctreedir=os.path.join(out, '.doctrees'),
+            buildername='html',
+            confoverrides={
+                'extensions': ['sphinxcontrib.redoc'],
+                'redoc': conf,
+                'redoc_cache': case['cache'],
+            },
+            status=None,
+            warning=io.StringIO())
+        app.build()
+
+        output_bytes = 0
+        for entry in range(case['entries']):
+            output_bytes += os.path.getsize(
+                str(app.builder.get_outfilename('api/%d' % entry)))
+        for dirpath, _, filenames in os.walk(os.path.join(out, '_specs')):
+            output_bytes += sum(
+                os.path.getsize(os.path.join(dirpath, filename))
+                for filename in filenames)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    peak_rss_bytes = None
+    if resource is not None:
+        # Linux reports kilobytes, while macOS reports bytes.
+        peak_rss_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != 'darwin':
+            peak_rss_bytes *= 1024
+
+    return dict(timings, peak_rss_bytes=peak_rss_bytes,
+                output_bytes=output_bytes)
+
+
+def run(cases, repeat):
+    results = []
+    for case in cases:
+        measurements = []
+        for _ in range(repeat):
+            output = subprocess.check_output(
+                [sys.executable, __file__, '--case', json.dumps(case)])
+            measurements.append(json.loads(output.decode('utf-8')))
+
+        # The best of repeated runs is the least affected by noise.
+        result = dict(case)
+        for metric in METRICS:
+            values = [m[metric] for m in measurements if m[metric] is not None]
+            result[metric] = min(values) if values else None
+        results.append(result)
+
+        sys.stderr.write('%(mode)s, %(operations)d operation(s), depth '
+                         '%(depth)d, %(entries)d page(s): '
+                         '%(render_seconds).3fs\n' % result)
+    return results
+
+
+def compare(baseline, results, threshold):
+    """Print changes of metrics and return True if nothing regressed."""
+    def key(result):
+        return tuple(result[name] for name in (
+            'operations', 'depth', 'entries', 'mode', 'cache'))
+
+    previous = dict((key(result), result) for result in baseline['results'])
+    ok = True
+
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+
+        for metric in METRICS:
+            if not before.get(metric) or result[metric] is None:
+                continue
+
+            change = float(result[metric]) / before[metric] - 1
+            regressed = change > threshold and not (
+                metric.endswith('_seconds')
+                and result[metric] - before[metric] < NOISE_SECONDS)
+            ok = ok and not regressed
+            print('%-6s %7d %3d %3d %-16s %+7.1f%%%s' % (
+                result['mode'], result['operations'], result['depth'],
+                result['entries'], metric, change * 100,
+                '  REGRESSED' if regressed else ''))
+
+    return ok
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--sizes', default='100,1000,10000,100000',
+        help='comma separated numbers of operations (default: %(default)s)')
+    parser.add_argument(
+        '--depths', default='1,20',
+        help='comma separated depths of $ref chains (default: %(default)s)')
+    parser.add_argument(
+        '--entries', default='1,20',
+        help='comma separated numbers of redoc entries '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--modes', default='embed,link',
+        help='comma separated modes (default: %(default)s)')
+    parser.add_argument(
+        '--cache', action='store_true',
+        help='keep redoc_cache enabled')
+    parser.add_argument(
+        '--repeat', type=int, default=1,
+        help='number of runs of each case (default: %(default)s)')
+    parser.add_argument(
+        '--output', help='write results into a given file')
+    parser.add_argument(
+        '--compare', help='compare results with a given file')
+    parser.add_argument(
+        '--threshold', type=float, default=0.1,
+        help='allowed relative regression (default: %(default)s)')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return 0
+
+    def integers(value):
+        return [int(item) for item in value.split(',')]
+
+    cases = [
+        {'operations': operations, 'depth': depth, 'entries': entries,
+         'mode': mode, 'cache': args.cache}
+        for operations, depth, entries, mode in itertools.product(
+            integers(args.sizes), integers(args.depths),
+            integers(args.entries), args.modes.split(','))
+    ]
+
+    results = {
+        'python': platform.python_version(),
+        'sphinx': sphinx.__version__,
+        'results': run(cases, args.repeat),
+    }
+
+    if args.output:
+        with io.open(args.output, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.compare:
+        with io.open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if not compare(baseline, results['results'], args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
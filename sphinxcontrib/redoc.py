@@ -11,19 +11,71 @@
 
 import io
 import os
+import posixpath
 import json
+import collections
+import contextlib
+import copy
+import gzip
+import fnmatch
+import glob
+import base64
+import hashlib
+import re
+import multiprocessing
+import multiprocessing.pool
+import shutil
+import socket
+import tempfile
+import threading
+import timeit
 
+import docutils.nodes
+import docutils.parsers.rst
+import docutils.utils
 import jinja2
 import jsonschema
+import markupsafe
 import pkg_resources
+import six
 import yaml
 
-from six.moves import urllib
-from sphinx.util.fileutil import copy_asset
-from sphinx.util.osutil import copyfile, ensuredir
+from six.moves import http_client, urllib
+from sphinx.builders.html import StandaloneHTMLBuilder
+from sphinx.util import logging
+from sphinx.util.osutil import ensuredir
 
 
 _HERE = os.path.abspath(os.path.dirname(__file__))
+_LOGGER = logging.getLogger(__name__)
+_SIDECARS = {'gzip': '.gz', 'brotli': '.br'}
+
+# Remote specs are fetched by that many threads at most, as fetching is
+# bound by network rather than by CPU.
+_FETCH_THREADS = 8
+
+# Redirects followed when remote specs are fetched over kept connections.
+_FETCH_REDIRECTS = 5
+# Criteria operations of specs are filtered by, see _filter_spec().
+_SPEC_FILTER_CRITERIA_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'tags': {
+            'type': 'array',
+            'items': {'type': 'string'}
+        },
+        'paths': {
+            'type': 'array',
+            'items': {'type': 'string'}
+        },
+        'extensions': {
+            'type': 'object',
+            'patternProperties': {'^x-': {}},
+            'additionalProperties': False,
+        },
+    },
+    'additionalProperties': False,
+}
 _REDOC_CONF_SCHEMA = {
     'type': 'array',
     'items': {
@@ -32,7 +84,49 @@ _REDOC_CONF_SCHEMA = {
             'name': {'type': 'string'},
             'page': {'type': 'string'},
             'spec': {'type': 'string'},
+            'specs': {'type': 'string'},
+            'index': {
+                'type': 'object',
+                'properties': {
+                    'page': {'type': 'string'},
+                    'title': {'type': 'string'},
+                },
+                'required': ['page'],
+                'additionalProperties': False,
+            },
             'embed': {'type': 'boolean'},
+            'shard': {'type': 'boolean'},
+            'bundle': {'type': 'boolean'},
+            'minify': {'type': 'boolean'},
+            'skeleton': {'type': 'boolean'},
+            'filter': {
+                'type': 'object',
+                'properties': {
+                    'include': _SPEC_FILTER_CRITERIA_SCHEMA,
+                    'exclude': _SPEC_FILTER_CRITERIA_SCHEMA,
+                },
+                'additionalProperties': False,
+            },
+            'search': {
+                'type': 'object',
+                'properties': {
+                    'index': {'type': 'boolean'},
+                    'sphinx': {'type': 'boolean'},
+                },
+                'additionalProperties': False,
+            },
+            'payload': {
+                'type': 'object',
+                'properties': {
+                    'compact': {'type': 'boolean'},
+                    'strip': {
+                        'type': 'array',
+                        'items': {'type': 'string'}
+                    },
+                    'gzip': {'type': 'boolean'},
+                },
+                'additionalProperties': False,
+            },
             'template': {'type': 'string'},
             'opts': {
                 'type': 'object',
@@ -54,11 +148,100 @@ _REDOC_CONF_SCHEMA = {
                 'additionalProperties': False,
             },
         },
-        'required': ['page', 'spec'],
+        'required': ['page'],
         'additionalProperties': False,
     },
 }
 
+# Files that are picked up when a directory of specs is given.
+_SPEC_EXTENSIONS = ('.json', '.yaml', '.yml')
+
+# Settings that affect how a spec is turned into JSON. They are mixed into
+# cache keys, so cached specs are invalidated once any of them is changed.
+_SPEC_LOADER_SETTINGS = {
+    'pyyaml': yaml.__version__,
+    'libyaml': yaml.__with_libyaml__,
+}
+
+# Backends to parse specs with: 'auto' picks JSON parser for '.json' specs,
+# and libyaml for others if PyYAML is built with it.
+_PARSERS = ('auto', 'json', 'libyaml', 'yaml')
+
+# Backends to dump compact JSON with, the default one is always available.
+_SERIALIZERS = ('json', 'orjson')
+
+# Build metrics are written into this file in output directory.
+_REPORT = 'redoc-build-report.json'
+
+# Logical names of fingerprinted files mapped to their actual names are
+# written into this file in output directory.
+_MANIFEST = 'redoc-manifest.json'
+
+# Embedded specs are written into pages after pages are rendered, in place
+# of this placeholder, so they are never held in memory as a whole.
+_SPEC_PLACEHOLDER = '@@sphinxcontrib-redoc:spec@@'
+
+# Spec fields that are maps of user defined names rather than spec objects.
+# Names are never stripped from embedded specs, no matter what they are.
+_SPEC_NAMED_FIELDS = frozenset([
+    'callbacks', 'content', 'definitions', 'encoding', 'headers', 'links',
+    'mapping', 'parameters', 'patternProperties', 'properties',
+    'requestBodies', 'responses', 'schemas', 'securityDefinitions',
+    'securitySchemes', 'variables',
+])
+
+# Spec fields that are maps (or lists) of objects of the same kind, and
+# sections of reusable objects these objects are hoisted into when bundled.
+_BUNDLE_CONTAINERS = {
+    'paths': 'paths',
+    'parameters': 'parameters',
+    'requestBodies': 'requestBodies',
+    'responses': 'responses',
+    'headers': 'headers',
+    'examples': 'examples',
+    'links': 'links',
+    'callbacks': 'callbacks',
+    'schemas': 'schemas',
+    'definitions': 'schemas',
+    'properties': 'schemas',
+    'patternProperties': 'schemas',
+    'securitySchemes': 'securitySchemes',
+}
+
+# Spec fields that are single objects of a kind other than a schema.
+_BUNDLE_FIELDS = {
+    'requestBody': 'requestBodies',
+}
+
+# Sections of reusable objects referred objects may be hoisted into.
+_BUNDLE_SECTIONS = frozenset([
+    'parameters', 'requestBodies', 'responses', 'headers', 'examples',
+    'links', 'callbacks', 'schemas', 'securitySchemes',
+])
+
+# Spec fields that hold objects shared across operations, i.e. the ones that
+# are usually referred by '$ref'.
+_SPEC_SHARED_FIELDS = ('components', 'definitions', 'parameters', 'responses')
+
+# Fields of operations that are kept in the index of sharded specs, so
+# operations are listed before their tags are loaded.
+_SHARD_STUB_FIELDS = ('tags', 'summary', 'operationId', 'deprecated')
+
+# Fields of operations in search index, and a maximum length of their
+# descriptions there.
+_SEARCH_FIELDS = ('id', 'method', 'path', 'operationId', 'summary',
+                  'description')
+_SEARCH_DESCRIPTION_LENGTH = 200
+
+_HTTP_METHODS = frozenset([
+    'get', 'put', 'post', 'delete', 'options', 'head', 'patch', 'trace',
+])
+
+# Spec fields that contain arbitrary user data rather than spec objects.
+_SPEC_DATA_FIELDS = frozenset([
+    'const', 'default', 'enum', 'example', 'examples', 'value',
+])
+
 
 def render(app):
     try:
@@ -75,50 +258,436 @@ def render(app):
             )
         )
 
-    for ctx in app.config.redoc:
-        if 'template' in ctx:
-            template_path = os.path.join(app.confdir, ctx['template'])
+    for i, ctx in enumerate(app.config.redoc):
+        if ('spec' in ctx) == ('specs' in ctx):
+            raise ValueError(
+                'Improper configuration for sphinxcontrib-redoc at %d: '
+                'either spec or specs is required' % i)
+        if 'index' in ctx and 'specs' not in ctx:
+            raise ValueError(
+                'Improper configuration for sphinxcontrib-redoc at %d.index: '
+                'index is supported along with specs only' % i)
+
+        # External specs are passed to browsers as is, so they can't be
+        # filtered unless they are fetched.
+        if 'filter' in ctx and _is_remote(ctx.get('spec', '')) \
+                and not app.config.redoc_fetch:
+            raise ValueError(
+                'Improper configuration for sphinxcontrib-redoc at '
+                '%d.filter: filter is supported for external specs along '
+                'with redoc_fetch only' % i)
+
+    parser, serializer = _backends(app)
+
+    # Entries that discover specs are expanded into pages on every build,
+    # so added and removed specs are picked up.
+    groups = [(ctx, _discover(app, ctx)) for ctx in app.config.redoc]
+    entries = [entry for _, group in groups for entry in group] \
+        + _directive_entries(app)
+
+    # Remote specs may be fetched at build time, in which case they are
+    # treated as local ones, and pages do not depend on other origins.
+    if app.config.redoc_fetch:
+        fetched = _prefetch(app, sorted(set(
+            ctx['spec'] for ctx in entries if _is_remote(ctx['spec']))))
+        entries = [
+            dict(ctx, spec=fetched[ctx['spec']])
+            if ctx['spec'] in fetched else ctx
+            for ctx in entries
+        ]
+
+    seen = set()
+    for ctx in entries:
+        if ctx['page'] in seen:
+            raise ValueError(
+                'Improper configuration for sphinxcontrib-redoc: page %r is '
+                'configured more than once' % ctx['page'])
+        seen.add(ctx['page'])
+
+    # Fingerprinted files are never changed once deployed, so they can be
+    # cached by browsers forever. Pages refer to ReDoc bundle by its
+    # fingerprinted name, and so it must be known before pages are rendered.
+    manifest = {}
+    if app.config.redoc_fingerprint:
+        bundle = _bundle(app)
+        redocjs = _fingerprinted(
+            app, '_static/redoc.js', _digest_file(bundle))
+        _copyfile(bundle, os.path.join(app.builder.outdir, redocjs))
+        manifest['_static/redoc.js'] = redocjs
+
+        entries = [dict(ctx, redocjs=redocjs) for ctx in entries]
+
+    # Rendering a page with a huge spec is expensive, so pages are rendered
+    # only if their inputs have been changed since the previous build, or if
+    # the rendered page is gone. Fingerprints are kept on our own, since
+    # Sphinx pickles the environment only if some document is changed.
+    fingerprintsfile = os.path.join(
+        app.doctreedir, 'redoc', 'fingerprints.json')
+    fingerprints = _read_json(fingerprintsfile)
+
+    # Files written by previous builds, so the ones no page refers to
+    # anymore can be told apart.
+    previous = _outputs(fingerprints.values())
+
+    # Files that look unchanged since the previous build are never read
+    # again, which matters when there are hundreds of specs.
+    digestsfile = os.path.join(app.doctreedir, 'redoc', 'digests.json')
+    digests = _read_json(digestsfile)
+
+    # Forced full builds (i.e. '-E' or '-a') render all pages once again,
+    # as that's the way to get everything rendered from scratch. Pages
+    # rendered again by the same application (e.g. in watch mode) are not.
+    fresh = getattr(app, 'fresh_env_used', getattr(
+        app, '_fresh_env_used', None))
+    if (fresh and not getattr(app.builder, '_redoc_rendered', False)) \
+            or getattr(app.builder, '_redoc_build_all', False):
+        fingerprints, digests = {}, {}
+    app.builder._redoc_rendered = True
+
+    current = dict(
+        (ctx['page'], _fingerprint(app, ctx, digests)) for ctx in entries)
+
+    pages = [
+        ctx for ctx in entries
+        if _is_outdated(
+            app, ctx['page'], fingerprints.get(ctx['page']),
+            current[ctx['page']], digests)
+    ]
+    skipped = len(entries) - len(pages)
+
+    # Serialized specs are kept in files between builds, or till the end of
+    # the build if the cache is disabled.
+    ensuredir(os.path.join(app.doctreedir, 'redoc'))
+    workdir = tempfile.mkdtemp(dir=os.path.join(app.doctreedir, 'redoc'))
+    cachedir = workdir
+    if app.config.redoc_cache:
+        cachedir = os.path.join(app.doctreedir, 'redoc', 'specs')
+
+    # Build metrics of every rendered page, so slow pages can be told apart.
+    # They are reported once assets are copied, see assets().
+    report = {
+        'pages': [],
+        'skipped': sorted(
+            set(current) - set(ctx['page'] for ctx in pages)),
+    }
+
+    try:
+        for page in _render(app, pages, fingerprints, fingerprintsfile,
+                            current, cachedir, workdir, report['pages'],
+                            parser, serializer):
+            yield page
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # Index pages are cheap to render, and they link pages that might be
+    # skipped, so they are rendered on every build.
+    for ctx, group in groups:
+        if ctx.get('index'):
+            yield _index_page(app, ctx['index'], group)
+
+    paths = _watched_paths(app, entries, fingerprints)
+    _write_atomic(digestsfile, json.dumps(dict(
+        (path, record) for path, record in digests.items() if path in paths
+    ), sort_keys=True).encode('utf-8'))
+
+    ensuredir(app.builder.outdir)
+    _write_atomic(
+        os.path.join(app.builder.outdir, _REPORT),
+        json.dumps(report, indent=2, sort_keys=True).encode('utf-8'))
+
+    # Records of pages that are not configured anymore are dropped, and
+    # so are files that no page refers to. Files that are not written by
+    # us are never touched.
+    for page in set(fingerprints) - set(current):
+        del fingerprints[page]
+    _write_atomic(
+        fingerprintsfile,
+        json.dumps(fingerprints, sort_keys=True).encode('utf-8'))
+    stale = previous - _outputs(fingerprints.values())
+
+    # Fingerprinted bundle is not an output of any page, so a superseded one
+    # is told by the manifest of the previous build.
+    redocjs = _read_json(os.path.join(
+        app.builder.outdir, _MANIFEST)).get('_static/redoc.js')
+    if redocjs and redocjs != manifest.get('_static/redoc.js'):
+        stale.add(redocjs)
+    _prune(app, stale)
+
+    # Pages that are up to date have their files written by previous
+    # builds, so the manifest is assembled from records of all pages.
+    for ctx in entries:
+        record = fingerprints.get(ctx['page']) or {}
+        manifest.update(record.get('manifest') or {})
+    _write_atomic(
+        os.path.join(app.builder.outdir, _MANIFEST),
+        json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    if app.config.redoc_cache and os.path.exists(cachedir):
+        _evict(cachedir, app.config.redoc_cache_size)
+
+    if skipped:
+        _LOGGER.info('sphinxcontrib-redoc: %d of %d page(s) are up to date, '
+                     'skipped', skipped, len(entries))
+
+
+def _render(app, pages, fingerprints, fingerprintsfile, current, cachedir,
+            workdir, report, parser, serializer):
+    # Specs to be embedded are independent from each other, and so they can
+    # be parsed and serialized concurrently, by as many processes as Sphinx
+    # uses unless told otherwise. Pages are still yielded in the order they
+    # are configured, so the build output stays deterministic.
+    processes = app.config.redoc_parallel
+    if processes is None:
+        processes = app.parallel
+    specs = {}
+    if processes > 1:
+        specs = _serialize_specs(
+            [(os.path.join(app.confdir, ctx['spec']), ctx['spec'], cachedir,
+              _payload(ctx), parser, serializer)
+             for ctx in pages if _payload(ctx) is not None],
+            processes)
+
+    def serialize(ctx, specfile, metrics):
+        key = _serialize_spec_key(specfile, _payload(ctx))
+        if key not in specs:
+            serialized = {}
+            specs[key] = _serialize_spec(
+                specfile, ctx['spec'], cachedir, _payload(ctx), parser,
+                serializer, serialized), serialized
+        result, serialized = specs[key]
+        metrics.update(serialized)
+
+        # Pages that use the same spec reuse the serialized one.
+        specs[key] = result, {'cache': 'hit'}
+        return result
+
+    # Many pages usually share the very same template, so templates are
+    # compiled once per build by means of shared Jinja2 environment.
+    templates = _template_environment(app)
+
+    # Specs (and files they refer to) are parsed at most once per build, no
+    # matter how many pages they are used by, and so are filtered specs.
+    documents, filtered = {}, {}
+
+    # Specs are written into output directory under names derived from
+    # their content, so specs of the same name never overwrite each other,
+    # and a spec shared by many pages is written once.
+    def write(path, data):
+        path = _content_addressed(path, hashlib.sha256(data).digest())
+        if not os.path.exists(os.path.join(app.builder.outdir, path)):
+            ensuredir(os.path.dirname(os.path.join(app.builder.outdir, path)))
+            _write_atomic(os.path.join(app.builder.outdir, path), data)
+        return path
+
+    def store(source, path):
+        path = _content_addressed(path, _digest_file(source))
+        if not os.path.exists(os.path.join(app.builder.outdir, path)):
+            _copyfile(source, os.path.join(app.builder.outdir, path))
+        return path
+
+    def write_json(path, document):
+        return write(path, _dumps(document, serializer).encode('utf-8'))
+
+    for ctx in pages:
+        started = timeit.default_timer()
+        metrics = {
+            'page': ctx['page'],
+            'template_seconds': 0.0,
+            'read_seconds': 0.0,
+            'parse_seconds': 0.0,
+            'serialize_seconds': 0.0,
+            'input_bytes': None,
+            'output_bytes': None,
+            'cache': None,
+        }
+
+        with _timed(metrics, 'template_seconds'):
+            template = templates.get_template(_template_path(app, ctx))
+        specfile = os.path.join(app.confdir, ctx['spec'])
+
+        # Configuration is never touched, so neither concurrent builds nor
+        # subsequent builds by the same application see what is rendered.
+        # Values passed to the template are set on a copy instead.
+        context = copy.deepcopy(ctx)
+        context.setdefault('opts', {})
+        context.setdefault('payload', {})
+        if not _is_remote(ctx['spec']):
+            metrics['input_bytes'] = os.path.getsize(specfile)
+
+        # Files written into output directory along with the page, and files
+        # the spec refers to. They are recorded, so the page is rendered
+        # again if any of outputs is gone or any of dependencies is changed.
+        # Outputs are mapped by their logical names too, as they may be
+        # fingerprinted.
+        outputs, depends, manifest = [], [], {}
+
+        specname = os.path.splitext(os.path.basename(ctx['spec']))[0]
+
+        # Pages may show a part of the spec only (e.g. public operations),
+        # in which case the spec is written as JSON with other operations
+        # and objects they refer to left out. Filtered specs are named
+        # after criteria too, so their logical names don't clash.
+        criteria = None
+        if ctx.get('filter') and not _is_remote(ctx['spec']):
+            criteria = json.dumps(ctx['filter'], sort_keys=True)
+            specname += '.' + hashlib.sha256(
+                criteria.encode('utf-8')).hexdigest()[:8]
+
+        key = (os.path.normpath(specfile), ctx.get('bundle') is True,
+               criteria)
+        spec = None
+        if criteria is not None and key in filtered:
+            spec, depends = filtered[key]
+            metrics['cache'] = 'hit'
+
         else:
-            template_path = os.path.join(_HERE, 'redoc.j2')
+            if ctx.get('bundle') is True and not _is_remote(ctx['spec']):
+                spec, depends = _bundle_spec(
+                    specfile, documents, metrics, parser)
 
-        with io.open(template_path, encoding='utf-8') as f:
-            template = jinja2.Template(f.read())
+            if criteria is not None:
+                if spec is None:
+                    spec = _load_spec(specfile, documents, metrics, parser)
+                with _timed(metrics, 'parse_seconds'):
+                    spec = _filter_spec(spec, ctx['filter'])
+                filtered[key] = spec, depends
+
+        search = dict(
+            (key, value) for key, value in (ctx.get('search') or {}).items()
+            if value is True)
+
+        parsed = spec
+        if (ctx.get('skeleton') is True or search) \
+                and not _is_remote(ctx['spec']) and parsed is None:
+            parsed = _load_spec(specfile, {}, metrics, parser)
+
+        # Static outline of the spec is shown until ReDoc is loaded, and is
+        # what crawlers and browsers without JavaScript get.
+        if ctx.get('skeleton') is True and parsed is not None:
+            context['outline'] = _outline(parsed)
+
+        # Operations are extracted into a compact search index at build time,
+        # so neither browsers nor Sphinx search have to walk the whole spec.
+        # The index is kept in doctrees directory too, as Sphinx search index
+        # is written from scratch on every build, see assets().
+        searchfile = None
+        if search and parsed is not None:
+            index = _search_index(parsed)
+            searchfile = os.path.join(
+                app.doctreedir, 'redoc', 'search', hashlib.sha256(
+                    ctx['page'].encode('utf-8')).hexdigest() + '.json')
+            ensuredir(os.path.dirname(searchfile))
+            _write_atomic(searchfile, _dumps(index).encode('utf-8'))
+
+            if search.get('index'):
+                path = write_json(
+                    os.path.join('_specs', specname + '.search.json'), index)
+                manifest['_specs/%s.search.json' % specname] = path
+                outputs.append(path)
+                context['search_index'] = path
+        parsed = None
 
         # In embed mode, we are going to embed the whole OpenAPI spec into
         # produced HTML. The rationale is very simple: we want to produce
         # browsable HTMLs ready to be used without any web server.
+        embedded = None
         if ctx.get('embed') is True:
-            # Parse & dump the spec to have it as properly formatted json
-            specfile = os.path.join(app.confdir, ctx['spec'])
-            with io.open(specfile, encoding='utf-8') as specfp:
-                try:
-                    spec_contents = yaml.safe_load(specfp)
-                except ValueError as ver:
-                    raise ValueError('Cannot parse spec %r: %s'
-                                     % (ctx['spec'], ver))
+            if spec is not None:
+                embedded = os.path.join(workdir, ctx['page'].replace(
+                    '/', '_') + '.json')
+                with _timed(metrics, 'serialize_seconds'):
+                    _write_atomic(embedded, _dump_payload(
+                        spec, ctx.get('payload') or {},
+                        serializer).encode('utf-8'))
+                    baseline = len(json.dumps(spec)) \
+                        if ctx.get('payload') else None
+            else:
+                # Parse & dump the spec to have it as properly formatted json
+                embedded, baseline = serialize(ctx, specfile, metrics)
+
+            if baseline is not None:
+                size = os.path.getsize(embedded)
+                _LOGGER.info(
+                    'sphinxcontrib-redoc: embedded spec of %s takes %d '
+                    'bytes instead of %d (%d%% saved)',
+                    ctx['page'], size, baseline,
+                    100 - 100 * size // max(baseline, 1))
+
+            # The spec is written into the page once it's rendered.
+            context['spec'] = _SPEC_PLACEHOLDER
+
+        # Sharded spec is split into an index document and per tag chunks
+        # that are loaded on demand, so first paint of huge APIs depends on
+        # the size of the index rather than the size of the whole spec.
+        elif ctx.get('shard') is True and not _is_remote(ctx['spec']):
+            if spec is None:
+                spec = _load_spec(specfile, documents, metrics, parser)
+
+            with _timed(metrics, 'serialize_seconds'):
+                shards = list(_shard_spec(spec))
+                index, chunks = shards[0][1], dict(shards[1:])
+
+                # The index refers to chunks by names derived from their
+                # content, so chunks are written first.
+                for name in sorted(chunks):
+                    path = write_json(
+                        os.path.join('_specs', specname, name), chunks[name])
+                    manifest['_specs/%s/%s' % (specname, name)] = path
+                    outputs.append(path)
+                    chunks[name] = os.path.relpath(
+                        path, os.path.join('_specs', specname)
+                    ).replace(os.sep, '/')
+
+                for tag in index['x-redoc-shards']['tags']:
+                    tag['url'] = chunks[tag['url']]
+                    tag['shared'] = [chunks[url] for url in tag['shared']]
+
+                path = write_json(
+                    os.path.join('_specs', specname, 'index.json'), index)
+                manifest['_specs/%s/index.json' % specname] = path
+                outputs.insert(0, path)
+
+            context['spec'] = outputs[0]
+
+        # Bundled spec is self-contained, and so it's the only file to be
+        # deployed along with the page.
+        elif spec is not None:
+            with _timed(metrics, 'serialize_seconds'):
+                path = write_json(
+                    os.path.join('_specs', specname + '.json'), spec)
+            manifest['_specs/%s.json' % specname] = path
+            outputs.append(path)
+
+            context['spec'] = path
 
-                ctx['spec'] = json.dumps(spec_contents)
+        # Minified JSON is smaller than the spec as is, and what is more
+        # important, browsers parse JSON way faster than ReDoc parses YAML.
+        elif ctx.get('minify') is True and not _is_remote(ctx['spec']):
+            serialized, _ = serialize(ctx, specfile, metrics)
+            with _timed(metrics, 'serialize_seconds'):
+                path = store(
+                    serialized, os.path.join('_specs', specname + '.json'))
+            manifest['_specs/%s.json' % specname] = path
+            outputs.append(path)
+
+            context['spec'] = path
 
         # The 'spec' may contain either HTTP(s) link or filesystem path. In
         # case of later we need to copy the spec into output directory, as
         # otherwise it won't be available when the result is deployed.
-        elif not ctx['spec'].startswith(('http', 'https')):
-
-            specpath = os.path.join(app.builder.outdir, '_specs')
-            specname = os.path.basename(ctx['spec'])
+        elif not _is_remote(ctx['spec']):
 
-            ensuredir(specpath)
-
-            copyfile(
-                # Since the path may be relative it should be joined with
-                # base URI which is a path of directory with conf.py in
-                # our case.
-                os.path.join(app.confdir, ctx['spec']),
-                os.path.join(specpath, specname))
+            # Since the path may be relative it should be joined with base
+            # URI which is a path of directory with conf.py in our case.
+            basename = os.path.basename(ctx['spec'])
+            with _timed(metrics, 'read_seconds'):
+                path = store(specfile, os.path.join('_specs', basename))
+            manifest['_specs/' + basename] = path
+            outputs.append(path)
 
             # The link inside the rendered document must refer to a new
             # location, the place where it has been copied to.
-            ctx['spec'] = os.path.join('_specs', specname)
+            context['spec'] = path
 
         # Propagate information about page rendering to Sphinx. There's
         # a little trick in here: we pass an actual Jinja2 template instance
@@ -126,8 +695,1223 @@ def render(app):
         # we can pass a template instance to Jinja2 environment and so on.
         # Such little trick allows us to avoid other hacks which require
         # manipulating of Sphinx's 'templates_path' option.
-        ctx.setdefault('opts', {})
-        yield ctx['page'], ctx, template
+        elapsed = timeit.default_timer() - started
+        yield ctx['page'], context, template
+        started = timeit.default_timer()
+
+        outfile = str(app.builder.get_outfilename(ctx['page']))
+        if embedded is not None:
+            with _timed(metrics, 'serialize_seconds'):
+                _splice(outfile, embedded)
+
+        metrics['output_bytes'] = sum(
+            os.path.getsize(path) for path in [outfile] + [
+                os.path.join(app.builder.outdir, output)
+                for output in outputs])
+
+        # Rendered pages are of no use anymore, so nothing should keep
+        # references to their data.
+        context = spec = None
+
+        # The page has been written by now, so it's safe to record its
+        # fingerprint. Pages failed to render are never recorded.
+        fingerprints[ctx['page']] = {
+            'fingerprint': current[ctx['page']],
+            'outputs': outputs,
+            'manifest': dict(
+                (key, value.replace(os.sep, '/'))
+                for key, value in manifest.items()),
+            'depends': dict(
+                (path, _encode_digest(path)) for path in depends),
+            'search': searchfile,
+        }
+        ensuredir(os.path.dirname(fingerprintsfile))
+        _write_atomic(
+            fingerprintsfile,
+            json.dumps(fingerprints, sort_keys=True).encode('utf-8'))
+
+        # Time spent by Sphinx to render the template and to write the page
+        # is not accounted.
+        metrics['seconds'] = elapsed + timeit.default_timer() - started
+        report.append(metrics)
+
+
+def _discover(app, ctx):
+    """Return entries of pages of a given ``redoc`` entry.
+
+    Entries with ``specs`` are expanded into an entry per discovered spec,
+    with ``{name}`` and ``{path}`` placeholders substituted with the name
+    of the spec and its path relative to the searched directory, without
+    extension. Other entries are returned as is.
+    """
+    if 'specs' not in ctx:
+        return [ctx]
+
+    pattern = os.path.join(app.confdir, ctx['specs'])
+    if os.path.isdir(pattern):
+        root = pattern
+        found = [
+            path for path in glob.glob(os.path.join(pattern, '*'))
+            if path.lower().endswith(_SPEC_EXTENSIONS)
+        ]
+    else:
+        root = os.path.dirname(pattern)
+        while glob.has_magic(root):
+            root = os.path.dirname(root)
+        found = glob.glob(pattern)
+
+    entries = []
+    for specfile in sorted(path for path in found if os.path.isfile(path)):
+        path = os.path.splitext(
+            os.path.relpath(specfile, root))[0].replace(os.sep, '/')
+        values = {'{name}': os.path.basename(path), '{path}': path}
+
+        entry = dict(
+            (key, value) for key, value in ctx.items()
+            if key not in ('specs', 'index'))
+        entry['spec'] = os.path.relpath(
+            specfile, app.confdir).replace(os.sep, '/')
+        entry['page'] = _substitute(ctx['page'], values)
+        entry['name'] = _substitute(ctx.get('name', '{name}'), values)
+        entries.append(entry)
+    return entries
+
+
+def _entries(app):
+    return [
+        entry for ctx in app.config.redoc for entry in _discover(app, ctx)
+    ] + _directive_entries(app)
+
+
+def _directive_entries(app):
+    # Directives that render the very same spec the very same way share the
+    # page, so the spec is processed once no matter how many times it's used.
+    pages = getattr(app.env, 'redoc_pages', {})
+    entries = collections.OrderedDict()
+    for docname in sorted(pages):
+        for ctx in pages[docname]:
+            entries.setdefault(ctx['page'], ctx)
+    return list(entries.values())
+
+
+def _substitute(pattern, values):
+    for placeholder, value in values.items():
+        pattern = pattern.replace(placeholder, value)
+    return pattern
+
+
+def _index_page(app, index, entries):
+    title = index.get('title') or 'APIs'
+    body = ['<h1>%s</h1>' % markupsafe.escape(title), '<ul>']
+    for ctx in entries:
+        body.append('<li><a href="%s">%s</a></li>' % (
+            markupsafe.escape(
+                app.builder.get_relative_uri(index['page'], ctx['page'])),
+            markupsafe.escape(ctx.get('name') or ctx['page'])))
+    body.append('</ul>')
+
+    # The index is rendered by the theme, so it looks like any other page
+    # of the docs.
+    return index['page'], {'title': title, 'body': '\n'.join(body)}, \
+        'page.html'
+
+
+def _outputs(records):
+    return set(
+        path for record in records if isinstance(record, dict)
+        for path in record.get('outputs') or [])
+
+
+def _prune(app, paths):
+    outdir = os.path.abspath(str(app.builder.outdir))
+    for path in paths:
+        path = os.path.join(outdir, path)
+        for sidecar in [''] + list(_SIDECARS.values()):
+            if os.path.exists(path + sidecar):
+                os.remove(path + sidecar)
+
+        # Directories of sharded specs are removed once they are empty.
+        directory = os.path.dirname(path)
+        while directory.startswith(outdir + os.sep) \
+                and os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+
+
+def _fingerprint(app, ctx, digests=None):
+    digest = hashlib.sha256()
+    digest.update(app.extensions[__name__].version.encode('utf-8'))
+    digest.update(app.builder.name.encode('utf-8'))
+    digest.update(json.dumps(ctx, sort_keys=True).encode('utf-8'))
+    digest.update(json.dumps([
+        app.config.redoc_parser,
+        app.config.redoc_serializer,
+    ]).encode('utf-8'))
+    digest.update(_digest_file(_template_path(app, ctx)))
+    if not _is_remote(ctx['spec']):
+        digest.update(_digest_file(
+            os.path.join(app.confdir, ctx['spec']), digests))
+    return digest.hexdigest()
+
+
+def _backends(app):
+    parser, serializer = app.config.redoc_parser, app.config.redoc_serializer
+
+    for name, value, choices in [('redoc_parser', parser, _PARSERS),
+                                 ('redoc_serializer', serializer,
+                                  _SERIALIZERS)]:
+        if value not in choices:
+            raise ValueError(
+                'Improper configuration for sphinxcontrib-redoc at %s: %r '
+                'is not one of %s' % (name, value, ', '.join(choices)))
+
+    # Faster backends are optional, so builds do not fail if they are
+    # missing on some machine.
+    if parser == 'libyaml' and not yaml.__with_libyaml__:
+        _LOGGER.warning('sphinxcontrib-redoc: PyYAML is built without '
+                        'libyaml, pure Python parser is used instead')
+        parser = 'yaml'
+
+    if serializer == 'orjson':
+        try:
+            import orjson  # noqa
+        except ImportError:
+            _LOGGER.warning('sphinxcontrib-redoc: orjson is not installed, '
+                            'json is used instead')
+            serializer = 'json'
+
+    return parser, serializer
+
+
+def _read_json(path):
+    try:
+        with io.open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _is_outdated(app, page, record, fingerprint, digests=None):
+    if not isinstance(record, dict) or record['fingerprint'] != fingerprint:
+        return True
+
+    if not os.path.exists(app.builder.get_outfilename(page)):
+        return True
+
+    if not all(os.path.exists(os.path.join(app.builder.outdir, path))
+               for path in record['outputs']):
+        return True
+
+    if record.get('search') and not os.path.exists(record['search']):
+        return True
+
+    for path, digest in record.get('depends', {}).items():
+        if not os.path.exists(path) \
+                or _encode_digest(path, digests) != digest:
+            return True
+
+    return False
+
+
+def _is_remote(spec):
+    return urllib.parse.urlsplit(spec).scheme in ('http', 'https')
+
+
+def _template_path(app, ctx):
+    if 'template' in ctx:
+        return os.path.abspath(os.path.join(app.confdir, ctx['template']))
+    return os.path.join(_HERE, 'redoc.j2')
+
+
+def _template_environment(app):
+    # Templates are referred by their absolute paths, so a loader that reads
+    # them straight from the filesystem is all we need.
+    def load(path):
+        mtime = os.path.getmtime(path)
+        with io.open(path, encoding='utf-8') as f:
+            source = f.read()
+        return source, path, lambda: os.path.getmtime(path) == mtime
+
+    # Compiled templates are persisted between builds too, so cold builds
+    # do not have to compile templates from scratch.
+    bytecode_cache = None
+    if app.config.redoc_cache:
+        cachedir = os.path.join(app.doctreedir, 'redoc', 'templates')
+        ensuredir(cachedir)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(cachedir)
+
+    return jinja2.Environment(
+        loader=jinja2.FunctionLoader(load),
+        bytecode_cache=bytecode_cache)
+
+
+def _digest_file(path, digests=None):
+    # Digests of files are memoized in *digests* along with their sizes and
+    # times, and are reused as long as these are the same.
+    if digests is not None:
+        stat = os.stat(path)
+        key = [stat.st_size, stat.st_mtime, stat.st_ctime]
+        if path in digests and digests[path][0] == key:
+            return base64.b64decode(digests[path][1])
+
+    digest = hashlib.sha256()
+    with io.open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+
+    if digests is not None:
+        digests[path] = [
+            key, base64.b64encode(digest.digest()).decode('ascii')]
+    return digest.digest()
+
+
+def _encode_digest(path, digests=None):
+    return base64.b64encode(_digest_file(path, digests)).decode('ascii')
+
+
+def _serialize_specs(jobs, processes):
+    # The very same spec may be embedded into several pages, e.g. when it's
+    # rendered with different options. There's no point to parse it twice.
+    unique = list(dict(
+        (_serialize_spec_key(job[0], job[3]), job) for job in jobs).items())
+    if not unique:
+        return {}
+
+    pool = multiprocessing.Pool(min(processes, len(unique)))
+    try:
+        # Specs are handed to processes in batches, so hundreds of small
+        # specs do not cost hundreds of round trips.
+        results = pool.map(
+            _serialize_spec_job, [job for _, job in unique],
+            chunksize=max(1, len(unique) // (processes * 4)))
+    finally:
+        pool.close()
+        pool.join()
+
+    return dict((key, result) for (key, _), result in zip(unique, results))
+
+
+def _serialize_spec_job(job):
+    metrics = {}
+    return _serialize_spec(*job, metrics=metrics), metrics
+
+
+def _payload(ctx):
+    # Settings of JSON the spec is serialized into, if it is serialized by
+    # means of _serialize_spec().
+    if _is_remote(ctx['spec']) or ctx.get('bundle') is True \
+            or ctx.get('filter'):
+        return None
+    if ctx.get('embed') is True:
+        return ctx.get('payload') or {}
+    if ctx.get('minify') is True and ctx.get('shard') is not True:
+        return {'compact': True}
+    return None
+
+
+def _serialize_spec_key(specfile, payload):
+    return specfile, json.dumps(payload or {}, sort_keys=True)
+
+
+def _serialize_spec(specfile, specname, cachedir, payload=None,
+                    parser='auto', serializer='json', metrics=None):
+    """Serialize a given spec into JSON payload to be embedded into a page.
+
+    The payload is written into a file in *cachedir*. The result is a tuple
+    of the file path and size of the spec serialized as is, which is known
+    only if payload options are used. Timings and cache status are recorded
+    into *metrics*.
+    """
+    metrics = metrics if metrics is not None else {}
+
+    # Parsing huge YAML specs is by far the most expensive thing we do, so
+    # serialized specs are kept on disk between builds. The cache key is
+    # derived from spec content, so there's no need to care about mtimes.
+    settings = dict(_SPEC_LOADER_SETTINGS, payload=payload or {},
+                    parser=parser, serializer=serializer)
+    with _timed(metrics, 'read_seconds'):
+        cachefile = os.path.join(
+            cachedir, _cache_key(specfile, settings) + '.json')
+
+    if os.path.exists(cachefile):
+        # Bump modification time so the least recently used entries are
+        # evicted first.
+        os.utime(cachefile, None)
+        metrics['cache'] = 'hit'
+        return cachefile, _read_baseline(cachefile) if payload else None
+
+    ensuredir(cachedir)
+    payload = payload or {}
+    metrics['cache'] = 'miss'
+
+    try:
+        if payload.get('strip') or payload.get('gzip'):
+            raise _Unstreamable()
+        baseline = _convert_spec(
+            specfile, specname, cachefile, payload.get('compact'), metrics,
+            parser)
+    except _Unstreamable:
+        metrics.pop('parse_seconds', None)
+        metrics.pop('serialize_seconds', None)
+        with _timed(metrics, 'read_seconds'):
+            with io.open(specfile, 'rb') as specfp:
+                content = specfp.read()
+        with _timed(metrics, 'parse_seconds'):
+            spec_contents = _parse_spec(content, specname, parser)
+        with _timed(metrics, 'serialize_seconds'):
+            baseline = len(json.dumps(spec_contents))
+            _write_atomic(cachefile, _dump_payload(
+                spec_contents, payload, serializer).encode('utf-8'))
+
+    if not payload:
+        return cachefile, None
+
+    # Size of the spec serialized as is is kept next to the payload, so
+    # savings can be reported even if the spec is not parsed at all.
+    _write_atomic(cachefile + '.size', str(baseline).encode('ascii'))
+    return cachefile, baseline
+
+
+class _Unstreamable(Exception):
+    pass
+
+
+def _convert_spec(specfile, specname, path, compact=False, metrics=None,
+                  parser='auto'):
+    """Convert a given YAML spec into JSON file straight from parser events.
+
+    Unlike loading and dumping the spec, the conversion never holds the
+    spec in memory, except for anchored nodes. Returns size of the spec
+    serialized as is. Raises :class:`_Unstreamable` if the spec uses merge
+    keys, which can't be resolved without loading the spec.
+    """
+    metrics = metrics if metrics is not None else {}
+
+    # JSON parser is by far faster than any YAML one, even though it holds
+    # the whole spec in memory.
+    if _is_json(specfile, parser):
+        raise _Unstreamable()
+
+    item_separator, key_separator = (',', ':') if compact else (', ', ': ')
+    resolver = yaml.resolver.Resolver()
+    constructor = yaml.constructor.SafeConstructor()
+
+    # Containers being written, as lists of [is mapping, number of items].
+    stack = []
+    # Events of anchored nodes, and of nodes being anchored.
+    anchors, recording = {}, []
+    baseline = [0]
+
+    def write(text, astext=None):
+        out.write(text)
+        baseline[0] += len(text if astext is None else astext)
+
+    def separate():
+        if not stack:
+            return False
+        container = stack[-1]
+        if container[0] and container[1] % 2:
+            write(key_separator, ': ')
+        elif container[1]:
+            write(item_separator, ', ')
+        container[1] += 1
+        return container[0] and container[1] % 2
+
+    def scalar(event):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = resolver.resolve(
+                yaml.ScalarNode, event.value, event.implicit)
+        if tag == 'tag:yaml.org,2002:merge':
+            raise _Unstreamable()
+
+        construct = constructor.yaml_constructors.get(
+            tag, constructor.yaml_constructors[None])
+        value = construct(constructor, yaml.ScalarNode(
+            tag, event.value, event.start_mark, event.end_mark, event.style))
+
+        serialized = json.dumps(value)
+        if separate() and not isinstance(value, six.string_types):
+            # JSON keys are always strings.
+            serialized = json.dumps(serialized)
+        if compact:
+            write(serialized.replace('</', '<\\/'), serialized)
+        else:
+            write(serialized)
+
+    def handle(event):
+        if isinstance(event, yaml.AliasEvent):
+            if event.anchor not in anchors:
+                raise yaml.composer.ComposerError(
+                    None, None, 'found undefined or recursive alias %r'
+                    % event.anchor, event.start_mark)
+            for replayed in anchors[event.anchor]:
+                handle(replayed)
+            return
+
+        for _, events, _ in recording:
+            events.append(event)
+
+        if isinstance(event, yaml.ScalarEvent):
+            if event.anchor is not None:
+                anchors[event.anchor] = [_strip_anchor(event)]
+            scalar(event)
+
+        elif isinstance(event, yaml.CollectionStartEvent):
+            if separate():
+                raise yaml.composer.ComposerError(
+                    None, None, 'found unacceptable key', event.start_mark)
+            if event.anchor is not None:
+                recording.append(
+                    (event.anchor, [_strip_anchor(event)], len(stack)))
+            mapping = isinstance(event, yaml.MappingStartEvent)
+            write('{' if mapping else '[')
+            stack.append([mapping, 0])
+
+        elif isinstance(event, yaml.CollectionEndEvent):
+            write('}' if stack.pop()[0] else ']')
+
+        while recording and recording[-1][2] == len(stack):
+            anchor, events, _ = recording.pop()
+            anchors[anchor] = events
+
+    # The payload is written into a temporary file first, so a spec failed
+    # to be converted never leaves a truncated cache entry behind.
+    tmppath = '%s.%d.tmp' % (path, os.getpid())
+    out = io.open(tmppath, 'w', encoding='ascii')
+    try:
+        with io.open(specfile, encoding='utf-8') as specfp, \
+                _timed(metrics, 'parse_seconds'):
+            documents = 0
+            for event in yaml.parse(specfp, Loader=_yaml_loader(parser)):
+                if isinstance(event, yaml.DocumentStartEvent):
+                    documents += 1
+                    if documents > 1:
+                        raise yaml.composer.ComposerError(
+                            'expected a single document in the stream',
+                            None, 'but found another document',
+                            event.start_mark)
+                elif isinstance(event, (
+                        yaml.NodeEvent, yaml.CollectionEndEvent)):
+                    with _timed(metrics, 'serialize_seconds'):
+                        handle(event)
+            if not baseline[0]:
+                write('null')
+
+        # Parser events are produced lazily, so time spent to write them
+        # is subtracted from time spent in the loop.
+        metrics['parse_seconds'] -= metrics.get('serialize_seconds', 0.0)
+    except BaseException as exc:
+        out.close()
+        os.remove(tmppath)
+        if isinstance(exc, yaml.YAMLError):
+            raise ValueError('Cannot parse spec %r: %s' % (specname, exc))
+        raise
+
+    out.close()
+    _replace(tmppath, path)
+    return baseline[0]
+
+
+def _strip_anchor(event):
+    # Replayed nodes must not define their anchors once again.
+    event = copy.copy(event)
+    event.anchor = None
+    return event
+
+
+def _splice(path, specpath):
+    """Write a given spec into the page in place of its placeholder."""
+    with io.open(path, 'rb') as f:
+        parts = f.read().split(_SPEC_PLACEHOLDER.encode('ascii'))
+    if len(parts) == 1:
+        return
+
+    tmppath = '%s.%d.tmp' % (path, os.getpid())
+    with io.open(tmppath, 'wb') as out:
+        out.write(parts[0])
+        for part in parts[1:]:
+            with io.open(specpath, 'rb') as specfp:
+                shutil.copyfileobj(specfp, out)
+            out.write(part)
+    _replace(tmppath, path)
+
+
+def _read_baseline(cachefile):
+    try:
+        with io.open(cachefile + '.size', encoding='ascii') as f:
+            baseline = int(f.read())
+    except (IOError, OSError, ValueError):
+        # The sidecar might be evicted on its own, in which case there's
+        # nothing to report.
+        return None
+
+    os.utime(cachefile + '.size', None)
+    return baseline
+
+
+def _load_spec(specfile, documents, metrics=None, parser='auto'):
+    metrics = metrics if metrics is not None else {}
+    specfile = os.path.normpath(specfile)
+    if specfile not in documents:
+        with _timed(metrics, 'read_seconds'):
+            with io.open(specfile, 'rb') as f:
+                content = f.read()
+        with _timed(metrics, 'parse_seconds'):
+            documents[specfile] = _parse_spec(content, specfile, parser)
+    return documents[specfile]
+
+
+def _bundle_spec(specfile, documents, metrics=None, parser='auto'):
+    """Return a given spec with external references resolved.
+
+    Referred objects are hoisted into the spec's reusable objects (e.g.
+    components) rather than inlined, and identical objects are hoisted only
+    once. Parsed files are memoized in *documents*. The result is a tuple
+    of the bundled spec and the list of files it refers to.
+    """
+    specfile = os.path.normpath(specfile)
+    spec = _load_spec(specfile, documents, metrics, parser)
+    swagger2 = 'swagger' in spec
+
+    hoisted, digests, depends = {}, {}, []
+    sections = collections.defaultdict(collections.OrderedDict)
+
+    def existing(section):
+        if swagger2:
+            return spec.get(section) or {}
+        return (spec.get('components') or {}).get(section) or {}
+
+    def hoist(path, pointer, context):
+        if (path, pointer) in hoisted:
+            return hoisted[(path, pointer)]
+
+        if path not in depends:
+            depends.append(path)
+        target = _resolve_pointer(
+            _load_spec(path, documents, metrics, parser), pointer)
+
+        section, name = _hoist_location(path, pointer, context, swagger2)
+        candidate, i = name, 1
+        while candidate in sections[section] \
+                or candidate in existing(section):
+            i += 1
+            candidate = '%s%d' % (name, i)
+
+        if swagger2:
+            ref = '#/%s/%s' % (section, candidate)
+        else:
+            ref = '#/components/%s/%s' % (section, candidate)
+
+        # Reserve the name before resolving, so recursive references refer
+        # to the object being hoisted.
+        hoisted[(path, pointer)] = ref
+        sections[section][candidate] = None
+        resolved = resolve(target, path, section)
+
+        digest = json.dumps(resolved, sort_keys=True)
+        if digest in digests and ref not in digest:
+            del sections[section][candidate]
+            hoisted[(path, pointer)] = digests[digest]
+        else:
+            digests[digest] = ref
+            sections[section][candidate] = resolved
+        return hoisted[(path, pointer)]
+
+    # The kind of every object is told by the map it is in (e.g. objects in
+    # 'responses' are responses, no matter what their codes are), or by the
+    # field it is in otherwise.
+    def resolve(node, base, context, container=False):
+        if isinstance(node, dict):
+            ref = node.get('$ref')
+            if isinstance(ref, six.string_types) and not container:
+                target, _, pointer = ref.partition('#')
+                if target:
+                    target = os.path.normpath(
+                        os.path.join(os.path.dirname(base), target))
+                else:
+                    target = base
+
+                # Path items are not reusable objects in OpenAPI 3.0, and
+                # so they are inlined.
+                if target != specfile and context == 'paths':
+                    if target not in depends:
+                        depends.append(target)
+                    return resolve(_resolve_pointer(
+                        _load_spec(target, documents, metrics, parser),
+                        pointer), target, None)
+                if target != specfile:
+                    return {'$ref': hoist(target, pointer, context)}
+                if base != specfile:
+                    return {'$ref': '#' + pointer}
+
+            resolved = {}
+            for key, value in node.items():
+                if container and not key.startswith('x-'):
+                    resolved[key] = resolve(value, base, context)
+                elif key in _BUNDLE_CONTAINERS:
+                    resolved[key] = resolve(
+                        value, base, _BUNDLE_CONTAINERS[key], True)
+                else:
+                    resolved[key] = resolve(
+                        value, base, _BUNDLE_FIELDS.get(key))
+            return resolved
+
+        if isinstance(node, list):
+            return [resolve(item, base, context) for item in node]
+
+        return node
+
+    bundled = resolve(spec, specfile, None)
+
+    for section, objects in sections.items():
+        if swagger2:
+            parent = bundled
+        else:
+            parent = bundled.setdefault('components', {})
+        parent.setdefault(section, {}).update(objects)
+
+    return bundled, depends
+
+
+def _resolve_pointer(document, pointer):
+    for part in [part for part in pointer.split('/') if part]:
+        part = urllib.parse.unquote(part).replace('~1', '/').replace('~0', '~')
+        if isinstance(document, list):
+            part = int(part)
+        document = document[part]
+    return document
+
+
+def _hoist_location(path, pointer, context, swagger2):
+    parts = [part for part in pointer.split('/') if part]
+
+    if len(parts) == 3 and parts[0] == 'components':
+        section, name = parts[1], parts[2]
+    elif len(parts) == 2 and parts[0] in _SPEC_SHARED_FIELDS:
+        section, name = parts[0], parts[1]
+    else:
+        # Whole files or arbitrary objects in them are named after the
+        # file, and their kind is derived from where they are referred.
+        section = context if context in _BUNDLE_SECTIONS else 'schemas'
+        name = os.path.splitext(os.path.basename(path))[0]
+        if parts:
+            name += '_' + parts[-1]
+
+    # Swagger 2.0 has fewer kinds of reusable objects, and schemas are
+    # called definitions there.
+    if swagger2:
+        section = {
+            'definitions': 'definitions',
+            'parameters': 'parameters',
+            'responses': 'responses',
+        }.get(section, 'definitions')
+    elif section == 'definitions':
+        section = 'schemas'
+
+    return section, re.sub(r'[^A-Za-z0-9._-]', '_', name)
+
+
+def _parse_spec(content, specname, parser='auto'):
+    content = content.decode('utf-8')
+
+    if _is_json(specname, parser):
+        try:
+            return json.loads(content)
+        except ValueError as ver:
+            # Specs named '.json' are not necessarily JSON, so let YAML
+            # parser, which is more forgiving, have a try.
+            if parser == 'json':
+                raise ValueError('Cannot parse spec %r: %s' % (specname, ver))
+
+    try:
+        return yaml.load(content, Loader=_yaml_loader(parser))
+    except ValueError as ver:
+        raise ValueError('Cannot parse spec %r: %s' % (specname, ver))
+
+
+def _is_json(specname, parser):
+    return parser == 'json' or (
+        parser == 'auto' and specname.lower().endswith('.json'))
+
+
+def _yaml_loader(parser):
+    if parser in ('auto', 'libyaml') and yaml.__with_libyaml__:
+        return yaml.CSafeLoader
+    return yaml.SafeLoader
+
+
+def _shard_spec(spec):
+    """Split a given spec into an index document and per tag chunks.
+
+    Yields pairs of relative file name and document, the index document
+    goes first. The index lists all operations by their summaries, while
+    chunks hold operations of their tags in full. Reusable objects (e.g.
+    components) are grouped by sets of tags that refer to them, so a tag is
+    loaded along with objects it needs only.
+    """
+    swagger2 = 'swagger' in spec
+    index = dict(
+        (key, value) for key, value in spec.items()
+        if key != 'paths' and key not in _SPEC_SHARED_FIELDS)
+    index['paths'] = {}
+
+    # Security schemes are referred by names rather than by '$ref', and so
+    # they are kept in the index.
+    if not swagger2 and isinstance(spec.get('components'), dict):
+        components = dict(
+            (section, objects)
+            for section, objects in spec['components'].items()
+            if section == 'securitySchemes' or section.startswith('x-'))
+        if components:
+            index['components'] = components
+
+    # Chunks are ordered the same way tags are, so the first chunk is the
+    # one ReDoc shows first.
+    chunks = collections.OrderedDict(
+        (tag['name'], None) for tag in spec.get('tags') or [])
+
+    for path, item in _path_items(spec):
+        common = dict(
+            (key, value) for key, value in item.items()
+            if key not in _HTTP_METHODS)
+
+        for method, operation in item.items():
+            if method not in _HTTP_METHODS:
+                continue
+
+            tag = (operation.get('tags') or [''])[0]
+            if chunks.get(tag) is None:
+                chunks[tag] = {'paths': {}}
+            chunks[tag]['paths'].setdefault(path, dict(common))[method] = \
+                operation
+
+            stub = dict(
+                (key, operation[key]) for key in _SHARD_STUB_FIELDS
+                if key in operation)
+            stub['description'] = '[Show details](#tag/%s)' % (
+                urllib.parse.quote(tag))
+            stub['responses'] = {}
+            index['paths'].setdefault(path, {})[method] = stub
+
+    chunks = [(tag, chunk) for tag, chunk in chunks.items() if chunk]
+
+    # Objects no operation refers to are left out.
+    base = dict(
+        (key, spec[key]) for key in _SPEC_SHARED_FIELDS + ('swagger',)
+        if key in spec)
+    groups = collections.defaultdict(list)
+    for i, (_, chunk) in enumerate(chunks):
+        for location in _reachable(dict(base, paths=chunk['paths'])):
+            groups[location].append(i)
+
+    shared = collections.OrderedDict()
+    for location, tags in sorted(groups.items(), key=lambda x: (x[1], x[0])):
+        shared.setdefault(tuple(tags), []).append(location)
+
+    documents = []
+    for locations in shared.values():
+        document = {}
+        for section, name in locations:
+            if swagger2:
+                objects = spec[section]
+                parent = document
+            else:
+                objects = spec['components'][section]
+                parent = document.setdefault('components', {})
+            parent.setdefault(section, {})[name] = objects[name]
+        documents.append(document)
+
+    index['x-redoc-shards'] = {
+        'tags': [
+            {'name': tag, 'url': 'tags/%d.json' % i, 'shared': [
+                'shared/%d.json' % j
+                for j, tags in enumerate(shared) if i in tags]}
+            for i, (tag, _) in enumerate(chunks)
+        ],
+    }
+
+    yield 'index.json', index
+    for i, document in enumerate(documents):
+        yield 'shared/%d.json' % i, document
+    for i, (_, chunk) in enumerate(chunks):
+        yield 'tags/%d.json' % i, chunk
+
+
+def _path_items(spec):
+    """Yield paths of a given spec along with their path items.
+
+    Path items that refer to other objects of the spec are resolved, so
+    their operations are seen the same way as operations of other items.
+    """
+    for path, item in (spec.get('paths') or {}).items():
+        item = item or {}
+        ref = item.get('$ref')
+        if isinstance(ref, six.string_types):
+            if not ref.startswith('#'):
+                raise ValueError(
+                    'Cannot process path %r: it refers to %r, which is '
+                    'supported for bundled specs only' % (path, ref))
+            resolved = dict(_resolve_pointer(spec, ref[1:]) or {})
+            resolved.update(
+                (key, value) for key, value in item.items() if key != '$ref')
+            item = resolved
+        yield path, item
+
+
+def _outline(spec):
+    """Return tags of a given spec along with operations of every tag.
+
+    Anchors are the same ReDoc uses, so links to the outline keep working
+    once ReDoc is rendered. Operations without tags go first, as they do in
+    ReDoc.
+    """
+    tags = collections.OrderedDict([('', [])])
+    descriptions = {}
+    for tag in spec.get('tags') or []:
+        if isinstance(tag, dict) and tag.get('name'):
+            tags[tag['name']] = []
+            descriptions[tag['name']] = tag.get('description')
+
+    for path, item in (spec.get('paths') or {}).items():
+        for method, operation in (item or {}).items():
+            if method not in _HTTP_METHODS or not isinstance(operation, dict):
+                continue
+
+            for tag in operation.get('tags') or ['']:
+                tags.setdefault(tag, []).append({
+                    'id': _operation_anchor(operation),
+                    'method': method,
+                    'path': path,
+                    'summary': operation.get('summary'),
+                    'deprecated': operation.get('deprecated') is True,
+                })
+
+    info = spec.get('info') or {}
+    return {
+        'title': info.get('title'),
+        'version': info.get('version'),
+        'tags': [
+            {
+                'id': 'tag/' + urllib.parse.quote(name) if name else None,
+                'name': name,
+                'description': descriptions.get(name),
+                'operations': operations,
+            }
+            for name, operations in tags.items() if operations
+        ],
+    }
+
+
+def _operation_anchor(operation):
+    # ReDoc refers to operations by their IDs, encoded the same way as
+    # JavaScript's encodeURIComponent() does.
+    if not operation.get('operationId'):
+        return None
+    return 'operation/' + urllib.parse.quote(
+        operation['operationId'], safe='~()*!.\'')
+
+
+def _search_index(spec):
+    """Return a compact search index of operations of a given spec.
+
+    Operations are rows of values of fields listed in the index, so field
+    names are not repeated over and over again. Descriptions are cut down
+    to their first paragraphs.
+    """
+    operations = []
+    for path, item in (spec.get('paths') or {}).items():
+        for method, operation in (item or {}).items():
+            if method not in _HTTP_METHODS or not isinstance(operation, dict):
+                continue
+
+            description = operation.get('description') or ''
+            description = ' '.join(
+                re.split(r'\n\s*\n', description.strip())[0].split())
+            if len(description) > _SEARCH_DESCRIPTION_LENGTH:
+                description = \
+                    description[:_SEARCH_DESCRIPTION_LENGTH].rstrip() + '...'
+
+            operations.append([
+                _operation_anchor(operation),
+                method.upper(),
+                path,
+                operation.get('operationId'),
+                operation.get('summary'),
+                description or None,
+            ])
+
+    return {
+        'title': (spec.get('info') or {}).get('title'),
+        'fields': list(_SEARCH_FIELDS),
+        'operations': operations,
+    }
+
+
+def _filter_spec(spec, criteria):
+    """Return a given spec with operations filtered by *criteria*.
+
+    Operations are kept if they match any of ``include`` criteria (or if
+    there are none), unless they match any of ``exclude`` criteria. Tags
+    and reusable objects no kept operation refers to are left out too.
+    """
+    include = criteria.get('include') or {}
+    exclude = criteria.get('exclude') or {}
+
+    # Objects are shared with the spec rather than copied, as neither of
+    # them is modified.
+    paths, tags = {}, set()
+    for path, item in _path_items(spec):
+        operations = dict(
+            (method, operation) for method, operation in item.items()
+            if method in _HTTP_METHODS and isinstance(operation, dict)
+            and (not include or _matches(path, item, operation, include))
+            and not _matches(path, item, operation, exclude))
+        if operations:
+            paths[path] = dict(
+                (key, value) for key, value in item.items()
+                if key not in _HTTP_METHODS)
+            paths[path].update(operations)
+            for operation in operations.values():
+                tags.update(operation.get('tags') or [])
+
+    filtered = dict(spec, paths=paths)
+
+    # Path items referred by paths are inlined, so the original ones (e.g.
+    # in 'x-paths') must not reveal operations that are left out.
+    for item in (spec.get('paths') or {}).values():
+        ref = (item or {}).get('$ref')
+        parts = [
+            urllib.parse.unquote(part).replace('~1', '/').replace('~0', '~')
+            for part in ref[1:].split('/') if part
+        ] if isinstance(ref, six.string_types) else []
+        if len(parts) == 2 and isinstance(filtered.get(parts[0]), dict) \
+                and parts[0] not in ('paths',) + _SPEC_SHARED_FIELDS:
+            filtered[parts[0]] = dict(filtered[parts[0]])
+            filtered[parts[0]].pop(parts[1], None)
+
+    if spec.get('tags'):
+        filtered['tags'] = [
+            item for item in spec['tags']
+            if isinstance(item, dict) and item.get('name') in tags]
+    if spec.get('x-tagGroups'):
+        filtered['x-tagGroups'] = [
+            dict(group, tags=[
+                tag for tag in group.get('tags') or [] if tag in tags])
+            for group in spec['x-tagGroups']
+            if tags.intersection(group.get('tags') or [])]
+
+    # Reusable objects are kept only if they are reachable from what is
+    # left, i.e. referred directly or by other reachable objects.
+    reachable = _reachable(filtered)
+    if 'swagger' in spec:
+        for section in _SPEC_SHARED_FIELDS:
+            if isinstance(spec.get(section), dict):
+                filtered[section] = dict(
+                    (name, value) for name, value in spec[section].items()
+                    if (section, name) in reachable)
+    elif isinstance(spec.get('components'), dict):
+        # Security schemes are referred by names rather than by '$ref', and
+        # they are cheap, so they are kept as is.
+        filtered['components'] = dict(spec['components'])
+        for section, objects in spec['components'].items():
+            if isinstance(objects, dict) and section != 'securitySchemes' \
+                    and not section.startswith('x-'):
+                filtered['components'][section] = dict(
+                    (name, value) for name, value in objects.items()
+                    if (section, name) in reachable)
+    return filtered
+
+
+def _matches(path, item, operation, criteria):
+    if set(operation.get('tags') or []) & set(criteria.get('tags') or []):
+        return True
+
+    if any(path.startswith(prefix) for prefix in criteria.get('paths') or []):
+        return True
+
+    # Vendor extensions of path items apply to all their operations, unless
+    # operations override them.
+    for name, value in (criteria.get('extensions') or {}).items():
+        if name in operation:
+            if operation[name] == value:
+                return True
+        elif name in item and item[name] == value:
+            return True
+    return False
+
+
+def _reachable(spec):
+    """Return reusable objects referred from a given spec.
+
+    Objects are tuples of a section and a name, e.g. ``('schemas', 'Pet')``
+    or ``('definitions', 'Pet')`` for Swagger 2.0 specs. References are
+    followed transitively, starting from everything but reusable objects.
+    """
+    swagger2 = 'swagger' in spec
+    reachable = set()
+    nodes = [value for key, value in spec.items()
+             if key not in _SPEC_SHARED_FIELDS]
+
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, list):
+            nodes.extend(node)
+            continue
+        if not isinstance(node, dict):
+            continue
+        nodes.extend(node.values())
+
+        refs = [node.get('$ref')]
+        discriminator = node.get('discriminator')
+        if isinstance(discriminator, dict):
+            refs.extend(
+                value if value.startswith('#') else
+                '#/components/schemas/' + value
+                for value in (discriminator.get('mapping') or {}).values()
+                if isinstance(value, six.string_types))
+
+        for ref in refs:
+            if not isinstance(ref, six.string_types) \
+                    or not ref.startswith('#/'):
+                continue
+            parts = [
+                urllib.parse.unquote(part)
+                .replace('~1', '/').replace('~0', '~')
+                for part in ref[2:].split('/')]
+
+            if swagger2 and len(parts) >= 2 \
+                    and parts[0] in _SPEC_SHARED_FIELDS:
+                section, name = parts[0], parts[1]
+                objects = spec.get(section)
+            elif not swagger2 and len(parts) >= 3 \
+                    and parts[0] == 'components':
+                section, name = parts[1], parts[2]
+                objects = (spec.get('components') or {}).get(section)
+            else:
+                continue
+
+            if (section, name) not in reachable \
+                    and isinstance(objects, dict) and name in objects:
+                reachable.add((section, name))
+                nodes.append(objects[name])
+    return reachable
+
+
+def _dump_payload(spec, payload, serializer='json'):
+    if payload.get('strip'):
+        spec = _strip(spec, payload['strip'])
+
+    if payload.get('compact'):
+        # Escaping of '</' makes it impossible to close <script> tag from
+        # within the payload, and it's still a valid JSON.
+        serialized = _dumps(spec, serializer).replace('</', '<\\/')
+    else:
+        serialized = json.dumps(spec)
+
+    # Compressed payload is decompressed in browser by means of
+    # DecompressionStream API, which supports gzip out of the box.
+    if payload.get('gzip'):
+        serialized = base64.b64encode(
+            _gzip(serialized.encode('utf-8'))).decode('ascii')
+
+    return serialized
+
+
+def _fingerprinted(app, path, digest):
+    if not app.config.redoc_fingerprint:
+        return path
+    return _content_addressed(path, digest)
+
+
+def _content_addressed(path, digest):
+    stem, ext = os.path.splitext(path)
+    return '%s.%s%s' % (
+        stem, base64.b16encode(digest).decode('ascii').lower()[:12], ext)
+
+
+def _dumps(document, serializer='json'):
+    # The default serializer is used for payloads which must be formatted
+    # as they have always been, so faster ones produce compact JSON only.
+    if serializer == 'orjson':
+        import orjson
+        return orjson.dumps(
+            document, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(document, separators=(',', ':'))
+
+
+def _strip(node, patterns, named=False):
+    # Strip fields matching given patterns, but leave alone names (e.g.
+    # property or header names) and user data (e.g. examples) as those are
+    # rendered by ReDoc no matter what.
+    if isinstance(node, dict):
+        stripped = {}
+        for key, value in node.items():
+            if not named and any(
+                    fnmatch.fnmatchcase(key, pattern) for pattern in patterns):
+                continue
+            if not named and key in _SPEC_DATA_FIELDS:
+                stripped[key] = value
+            else:
+                stripped[key] = _strip(
+                    value, patterns,
+                    named=not named and key in _SPEC_NAMED_FIELDS)
+        return stripped
+
+    if isinstance(node, list):
+        return [_strip(item, patterns) for item in node]
+
+    return node
+
+
+def _cache_key(path, settings):
+    digest = hashlib.sha256(_digest_file(path))
+    digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def _timed(metrics, name):
+    started = timeit.default_timer()
+    try:
+        yield
+    finally:
+        metrics[name] = \
+            metrics.get(name, 0.0) + timeit.default_timer() - started
+
+
+def _write_atomic(path, data):
+    # Write into a temporary file first and move it into place afterwards,
+    # so an interrupted build never leaves a truncated cache entry behind.
+    tmppath = '%s.%d.tmp' % (path, os.getpid())
+    with io.open(tmppath, 'wb') as f:
+        f.write(data)
+    _replace(tmppath, path)
+
+
+def _replace(src, dst):
+    # Unlike POSIX, Windows refuses to rename a file if the target exists,
+    # and there's no os.replace() on Python 2.
+    try:
+        os.rename(src, dst)
+    except OSError:
+        os.remove(dst)
+        os.rename(src, dst)
+
+
+def _evict(cachedir, maxsize):
+    entries = []
+    for name in os.listdir(cachedir):
+        path = os.path.join(cachedir, name)
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= maxsize:
+            break
+        os.remove(path)
+        total -= size
 
 
 def assets(app, exception):
@@ -135,25 +1919,764 @@ def assets(app, exception):
     # need to either ensure its existence here or do not try to copy  assets
     # in case of failure.
     if not exception:
-        copy_asset(
-            os.path.join(_HERE, 'redoc.js'),
-            os.path.join(app.builder.outdir, '_static'))
+        staticdir = os.path.join(app.builder.outdir, '_static')
+        metrics = {}
+        started = timeit.default_timer()
+
+        bundle = _bundle(app)
+
+        if app.config.redoc_assets_mode not in ('copy', 'hardlink', 'reflink'):
+            raise ValueError(
+                'Improper configuration for sphinxcontrib-redoc at '
+                'redoc_assets_mode: %r is not one of copy, hardlink, reflink'
+                % app.config.redoc_assets_mode)
+
+        _copyfile(
+            bundle,
+            os.path.join(staticdir, 'redoc.js'),
+            mode=app.config.redoc_assets_mode)
+        metrics['bundle_seconds'] = timeit.default_timer() - started
+
+        with _timed(metrics, 'search_seconds'):
+            _feed_search(app)
+
+        if app.config.redoc_compress:
+            with _timed(metrics, 'compress_seconds'):
+                _compress_outputs(app)
+
+        metrics['seconds'] = timeit.default_timer() - started
+        _report(app, metrics)
+
+
+def _report(app, assets):
+    # Pages are rendered by HTML builders only, and so there's nothing to
+    # report otherwise.
+    reportfile = os.path.join(app.builder.outdir, _REPORT)
+    if not isinstance(app.builder, StandaloneHTMLBuilder) \
+            or not os.path.exists(reportfile):
+        return
+
+    with io.open(reportfile, encoding='utf-8') as f:
+        report = json.load(f)
+    report['assets'] = assets
+    _write_atomic(
+        reportfile,
+        json.dumps(report, indent=2, sort_keys=True).encode('utf-8'))
+
+    for metrics in report['pages']:
+        _LOGGER.verbose(
+            'sphinxcontrib-redoc: %s took %.3fs (template %.3fs, read %.3fs, '
+            'parse %.3fs, serialize %.3fs), %s bytes in, %s bytes out, '
+            'cache %s', metrics['page'], metrics['seconds'],
+            metrics['template_seconds'], metrics['read_seconds'],
+            metrics['parse_seconds'], metrics['serialize_seconds'],
+            metrics['input_bytes'], metrics['output_bytes'],
+            metrics['cache'])
+
+    if report['pages']:
+        slowest = max(report['pages'], key=lambda metrics: metrics['seconds'])
+        _LOGGER.info(
+            'sphinxcontrib-redoc: %d page(s) rendered in %.3fs, the slowest '
+            'is %s (%.3fs), %d cache hit(s); see %s',
+            len(report['pages']),
+            sum(metrics['seconds'] for metrics in report['pages']),
+            slowest['page'], slowest['seconds'],
+            sum(1 for metrics in report['pages'] if metrics['cache'] == 'hit'),
+            _REPORT)
+
+    # Let other extensions collect metrics, e.g. to track build performance
+    # over time.
+    app.emit('redoc-build-report', report)
+
+
+def _feed_search(app):
+    # Sphinx search index is written from scratch on every build, and only
+    # documents known to Sphinx survive, so ReDoc pages are fed to the index
+    # on every build, once Sphinx has written it.
+    indexer = getattr(app.builder, 'indexer', None)
+    if not isinstance(app.builder, StandaloneHTMLBuilder) or indexer is None:
+        return
+
+    fingerprints = _read_json(
+        os.path.join(app.doctreedir, 'redoc', 'fingerprints.json'))
+    fed = False
+    for ctx in _entries(app):
+        record = fingerprints.get(ctx['page'])
+        if (ctx.get('search') or {}).get('sphinx') is not True \
+                or not isinstance(record, dict) or not record.get('search'):
+            continue
+
+        index = _read_json(record['search'])
+        title = ctx.get('name') or index.get('title') or ctx['page']
+        indexer.feed(
+            ctx['page'], ctx['spec'], title, _search_doctree(index, title))
+        fed = True
+
+    if not fed:
+        return
+
+    if app.builder.indexer_dumps_unicode:
+        buf = io.StringIO()
+        indexer.dump(buf, app.builder.indexer_format)
+        data = buf.getvalue().encode('utf-8')
+    else:
+        buf = io.BytesIO()
+        indexer.dump(buf, app.builder.indexer_format)
+        data = buf.getvalue()
+    _write_atomic(
+        os.path.join(app.builder.outdir, app.builder.searchindex_filename),
+        data)
 
-        # It's hard to keep up with ReDoc releases, especially when you don't
-        # watch them closely. Hence, there should be a way to override built-in
-        # ReDoc bundle with some upstream one.
-        if app.config.redoc_uri:
-            urllib.request.urlretrieve(
-                app.config.redoc_uri,
-                os.path.join(app.builder.outdir, '_static', 'redoc.js'))
+
+def _search_doctree(index, title):
+    # Every operation is a section of its own, so Sphinx search refers to
+    # operations by the same anchors ReDoc uses. The very first title is the
+    # one of the page as far as Sphinx is concerned.
+    doctree = docutils.utils.new_document(title)
+    page = docutils.nodes.section()
+    page += docutils.nodes.title(text=title)
+    doctree += page
+    for row in index.get('operations') or []:
+        operation = dict(zip(index['fields'], row))
+        section = docutils.nodes.section(
+            ids=[operation['id']] if operation['id'] else [])
+        section += docutils.nodes.title(
+            text=operation['summary']
+            or '%s %s' % (operation['method'], operation['path']))
+        section += docutils.nodes.paragraph(text=' '.join(
+            value for value in (
+                operation['method'], operation['path'],
+                operation['operationId'], operation['description'])
+            if value))
+        page += section
+    return doctree
+
+
+class _redoc_frame(docutils.nodes.General, docutils.nodes.Element):
+    pass
+
+
+class _RedocDirective(docutils.parsers.rst.Directive):
+    """Render an OpenAPI spec with ReDoc inside a document.
+
+    ReDoc takes over the page it's rendered on, so the spec is rendered on
+    a page of its own, the same way pages of ``redoc`` entries are, and the
+    document shows that page in a frame.
+    """
+
+    required_arguments = 1
+    option_spec = {
+        'name': docutils.parsers.rst.directives.unchanged,
+        'tag': docutils.parsers.rst.directives.unchanged,
+        'embed': docutils.parsers.rst.directives.flag,
+        'height': (
+            docutils.parsers.rst.directives.length_or_percentage_or_unitless),
+    }
+
+    def run(self):
+        env = self.state.document.settings.env
+
+        ctx = {'spec': self.arguments[0]}
+        if 'name' in self.options:
+            ctx['name'] = self.options['name']
+        if 'tag' in self.options:
+            if _is_remote(ctx['spec']) and not env.config.redoc_fetch:
+                raise self.error(
+                    'The tag option is supported for external specs along '
+                    'with redoc_fetch only.')
+            ctx['filter'] = {'include': {'tags': [self.options['tag']]}}
+        if 'embed' in self.options:
+            ctx['embed'] = True
+
+        # Paths are relative to the document, or to the source directory if
+        # they start with '/', like paths of other Sphinx directives. Pages
+        # are named after paths relative to the source directory, so they
+        # are the same on any machine.
+        key = dict(ctx)
+        if not _is_remote(ctx['spec']):
+            key['spec'], ctx['spec'] = env.relfn2path(
+                ctx['spec'], env.docname)
+
+            # Documents that use the spec are read again once it's changed.
+            env.note_dependency(ctx['spec'])
+
+        ctx['page'] = '_redoc/' + hashlib.sha256(json.dumps(
+            key, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+        if not hasattr(env, 'redoc_pages'):
+            env.redoc_pages = {}
+        env.redoc_pages.setdefault(env.docname, []).append(ctx)
+
+        node = _redoc_frame()
+        node['page'] = ctx['page']
+        node['title'] = ctx.get('name') or 'API documentation'
+        node['height'] = self.options.get('height') or '600px'
+        if node['height'].isdigit():
+            node['height'] += 'px'
+        return [node]
+
+
+def _visit_redoc_frame(self, node):
+    self.body.append(
+        '<iframe class="redoc" src="%s" title="%s" style="width: 100%%; '
+        'height: %s; border: 0"></iframe>' % (
+            markupsafe.escape(self.builder.get_relative_uri(
+                self.builder.current_docname, node['page'])),
+            markupsafe.escape(node['title']),
+            markupsafe.escape(node['height'])))
+    raise docutils.nodes.SkipNode
+
+
+def _skip_redoc_frame(self, node):
+    # ReDoc pages are rendered by HTML builders only.
+    raise docutils.nodes.SkipNode
+
+
+def _purge_redoc_pages(app, env, docname):
+    getattr(env, 'redoc_pages', {}).pop(docname, None)
+
+
+def _merge_redoc_pages(app, env, docnames, other):
+    if not hasattr(env, 'redoc_pages'):
+        env.redoc_pages = {}
+    for docname, entries in getattr(other, 'redoc_pages', {}).items():
+        if docname in docnames:
+            env.redoc_pages[docname] = entries
+
+
+def watch(app, interval=0.5, stop=None):
+    """Render pages of ``redoc`` entries again once their files are changed.
+
+    Specs, templates and files that bundled specs refer to are polled every
+    *interval* seconds, and only pages affected by changes are rendered, by
+    the very same application that has built the docs. Runs until *stop*
+    event is set, or forever.
+    """
+    # Pages are rendered by HTML builders only, and so there's nothing to
+    # watch otherwise.
+    if not isinstance(app.builder, StandaloneHTMLBuilder):
+        _LOGGER.warning('sphinxcontrib-redoc: %s builder renders no pages, '
+                        'nothing to watch', app.builder.name)
+        return
+
+    # Files might be changed since the docs are built, so pages are brought
+    # up to date on the very first poll.
+    stop = stop if stop is not None else threading.Event()
+    stats = None
+
+    while not stop.wait(interval):
+        current = _watched(app)
+        if current == stats:
+            continue
+
+        # Files changed while pages are rendered are noticed on the next
+        # poll, as they are compared against the state prior to rendering.
+        stats = current
+        started = timeit.default_timer()
+        try:
+            _rebuild(app)
+        except Exception as exc:
+            # Specs are often broken while being edited, which is no reason
+            # to stop watching them.
+            _LOGGER.warning('sphinxcontrib-redoc: %s', exc)
+        else:
+            _LOGGER.info('sphinxcontrib-redoc: rebuilt in %.3fs',
+                         timeit.default_timer() - started)
+
+
+def _watched(app):
+    fingerprints = _read_json(
+        os.path.join(app.doctreedir, 'redoc', 'fingerprints.json'))
+
+    stats = {}
+    for path in _watched_paths(app, _entries(app), fingerprints):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stats[path] = None
+        else:
+            stats[path] = stat.st_mtime, stat.st_size
+    return stats
+
+
+def _watched_paths(app, entries, fingerprints):
+    # Files pages are rendered from: specs, templates and files that bundled
+    # specs refer to.
+    paths = set()
+    for ctx in entries:
+        paths.add(_template_path(app, ctx))
+        if not _is_remote(ctx['spec']):
+            paths.add(os.path.join(app.confdir, ctx['spec']))
+
+        record = fingerprints.get(ctx['page'])
+        if isinstance(record, dict):
+            paths.update(record.get('depends') or {})
+    return paths
+
+
+def _rebuild(app):
+    # Pages that are up to date are skipped by render(), so only changed
+    # pages are written. Sphinx writes pages of 'html-collect-pages' event
+    # the very same way.
+    for pagename, context, template in render(app):
+        app.builder.handle_page(pagename, context, template)
+    assets(app, None)
+
+
+def _prefetch(app, uris):
+    """Fetch remote specs concurrently, and return their local copies.
+
+    The result maps URIs to paths of copies in the doctrees directory. Every
+    thread keeps its connections open, so specs of the same host are fetched
+    over the same connection.
+    """
+    if not uris:
+        return {}
+
+    cachedir = os.path.join(app.doctreedir, 'redoc', 'remote')
+    local, pools = threading.local(), []
+
+    def fetch(uri):
+        if not hasattr(local, 'connections'):
+            local.connections = {}
+            pools.append(local.connections)
+
+        # Copies are named after URIs, so both parsers and pages see what
+        # kind of spec it is.
+        name = posixpath.basename(
+            urllib.parse.unquote(urllib.parse.urlsplit(uri).path))
+        return _fetch(
+            uri, os.path.join(cachedir, hashlib.sha256(
+                uri.encode('utf-8')).hexdigest()),
+            offline=app.config.redoc_offline,
+            connections=local.connections,
+            name=name or 'spec')
+
+    pool = multiprocessing.pool.ThreadPool(min(len(uris), _FETCH_THREADS))
+    try:
+        return dict(zip(uris, pool.map(fetch, uris)))
+    finally:
+        pool.close()
+        pool.join()
+        for connections in pools:
+            for connection in connections.values():
+                connection.close()
+
+
+def _note_build_all(app):
+    # Sphinx doesn't tell extensions whether all documents are being built
+    # (i.e. '-a' is passed), so the builder notes it when asked to.
+    build_all = app.builder.build_all
+
+    def wrapper(*args, **kwargs):
+        app.builder._redoc_build_all = True
+        try:
+            return build_all(*args, **kwargs)
+        finally:
+            app.builder._redoc_build_all = False
+
+    app.builder.build_all = wrapper
+
+
+def _bundle(app):
+    # It's hard to keep up with ReDoc releases, especially when you don't
+    # watch them closely. Hence, there should be a way to override built-in
+    # ReDoc bundle with some upstream one.
+    if not app.config.redoc_uri:
+        return os.path.join(_HERE, 'redoc.js')
+
+    # The bundle is needed to render pages and to copy assets, and it's
+    # fetched once per build for both.
+    bundle = getattr(app.builder, '_redoc_bundle', None)
+    if bundle is None:
+        bundle = app.builder._redoc_bundle = _fetch(
+            app.config.redoc_uri,
+            os.path.join(app.doctreedir, 'redoc', 'bundles'),
+            offline=app.config.redoc_offline,
+            integrity=app.config.redoc_uri_integrity)
+    return bundle
+
+
+def _compress_outputs(app):
+    # Non HTML builders do not produce ReDoc pages, so there's nothing to
+    # compress.
+    if not isinstance(app.builder, StandaloneHTMLBuilder):
+        return
+
+    formats = list(app.config.redoc_compress)
+    for fmt in formats:
+        if fmt not in _SIDECARS:
+            raise ValueError(
+                'Improper configuration for sphinxcontrib-redoc at '
+                'redoc_compress: %r is not one of %s'
+                % (fmt, ', '.join(sorted(_SIDECARS))))
+
+    if 'brotli' in formats:
+        try:
+            import brotli  # noqa
+        except ImportError:
+            _LOGGER.warning('sphinxcontrib-redoc: brotli is not installed, '
+                            'no .br files are produced')
+            formats.remove('brotli')
+
+    # Only the biggest files are worth to be precompressed: ReDoc bundle,
+    # copied specs and pages with embedded specs.
+    paths = [os.path.join(app.builder.outdir, '_static', 'redoc.js')]
+    if app.config.redoc_fingerprint:
+        paths.extend(
+            os.path.join(app.builder.outdir, path)
+            for path in _read_json(
+                os.path.join(app.builder.outdir, _MANIFEST)).values())
+    fingerprints = _read_json(
+        os.path.join(app.doctreedir, 'redoc', 'fingerprints.json'))
+    for ctx in _entries(app):
+        if ctx.get('embed') is True:
+            paths.append(str(app.builder.get_outfilename(ctx['page'])))
+
+        record = fingerprints.get(ctx['page'])
+        if isinstance(record, dict):
+            paths.extend(
+                os.path.join(app.builder.outdir, path)
+                for path in record['outputs'])
+
+    # Sidecars inherit modification time of their origins, which makes it
+    # cheap to figure out whether they are up to date.
+    jobs = []
+    for path in sorted(set(paths)):
+        if not os.path.exists(path):
+            continue
+
+        for fmt in formats:
+            sidecar = path + _SIDECARS[fmt]
+            if not os.path.exists(sidecar) \
+                    or os.stat(sidecar).st_mtime != os.stat(path).st_mtime:
+                jobs.append((path, fmt))
+
+    if not jobs:
+        return
+
+    # Compressors release GIL while compressing, hence threads are enough
+    # to keep all cores busy.
+    pool = multiprocessing.pool.ThreadPool(
+        min(len(jobs), multiprocessing.cpu_count()))
+    try:
+        pool.map(_compress, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _compress(job):
+    path, fmt = job
+
+    with io.open(path, 'rb') as f:
+        data = f.read()
+
+    if fmt == 'brotli':
+        import brotli
+        compressed = brotli.compress(data)
+    else:
+        compressed = _gzip(data)
+
+    sidecar = path + _SIDECARS[fmt]
+    _write_atomic(sidecar, compressed)
+    shutil.copystat(path, sidecar)
+
+
+def _copyfile(source, dest, mode='copy'):
+    # Unlike Sphinx's copyfile(), which refuses to overwrite existing files
+    # since Sphinx 8, outdated specs and bundles must be replaced.
+    if os.path.exists(dest):
+        # Hardlinked destination is up to date by definition, unless links
+        # are not wanted anymore. In that case it must be replaced with a
+        # copy, as otherwise editing it would modify the original file.
+        if os.path.samefile(source, dest):
+            if mode == 'hardlink' or os.stat(dest).st_nlink <= 1:
+                return
+            dest_is_link = True
+        else:
+            dest_is_link = False
+
+        # Copies preserve modification time, so the file is most likely
+        # unchanged if both size and modification time match. Otherwise,
+        # let's compare content hashes to be sure.
+        sstat, dstat = os.stat(source), os.stat(dest)
+        if not dest_is_link and sstat.st_size == dstat.st_size:
+            if sstat.st_mtime == dstat.st_mtime \
+                    or _digest_file(source) == _digest_file(dest):
+                return
+
+    ensuredir(os.path.dirname(dest))
+
+    # The destination is replaced rather than overwritten, as otherwise
+    # writing into a hardlinked file would modify the original one.
+    tmpdest = '%s.%d.tmp' % (dest, os.getpid())
+    if mode == 'hardlink':
+        try:
+            os.link(source, tmpdest)
+        except (AttributeError, OSError):
+            shutil.copy2(source, tmpdest)
+    elif mode == 'reflink':
+        if not _reflink(source, tmpdest):
+            shutil.copy2(source, tmpdest)
+    else:
+        shutil.copy2(source, tmpdest)
+    _replace(tmpdest, dest)
+
+
+def _reflink(source, dest):
+    # Reflinks (aka copy-on-write clones) are supported by some filesystems
+    # only (e.g. Btrfs, XFS, APFS), and there's no portable Python API for
+    # them. So let's try Linux's FICLONE, and fall back to copying otherwise.
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    with io.open(source, 'rb') as src, io.open(dest, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), 0x40049409, src.fileno())
+        except (IOError, OSError):
+            reflinked = False
+        else:
+            reflinked = True
+
+    if reflinked:
+        shutil.copystat(source, dest)
+    else:
+        os.remove(dest)
+    return reflinked
+
+
+def _fetch(uri, cachedir, offline=False, integrity=None, connections=None,
+           name=None):
+    """Return a path to a local copy of a resource located at a given URI.
+
+    Resources are cached on disk, and cached copies are revalidated with
+    conditional requests, so unchanged resources are never downloaded twice.
+    In offline mode, cached copies are used without touching the network.
+    Connections kept in *connections* are reused, if passed. The copy is
+    named *name* if passed, and after the URI otherwise.
+    """
+    path = os.path.join(
+        cachedir, name or hashlib.sha256(uri.encode('utf-8')).hexdigest())
+    metapath = path + '.json'
+
+    meta = {}
+    tampered = False
+    if os.path.exists(path) and os.path.exists(metapath):
+        # If pinned integrity has been changed, a cached copy is useless and
+        # must be downloaded again from scratch.
+        if integrity is None or _matches_integrity(path, integrity):
+            with io.open(metapath, encoding='utf-8') as f:
+                meta = json.load(f)
+        else:
+            tampered = True
+
+    if offline:
+        if tampered:
+            raise ValueError(
+                'Cannot use %r in offline mode: integrity check of cached '
+                'copy failed, expected %s' % (uri, integrity))
+        if not meta:
+            raise ValueError(
+                'Cannot use %r in offline mode: no cached copy is '
+                'available' % uri)
+        return path
+
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last-modified'):
+        headers['If-Modified-Since'] = meta['last-modified']
+
+    try:
+        if connections is None:
+            response = urllib.request.urlopen(
+                urllib.request.Request(uri, headers=headers))
+        else:
+            response = _request(uri, headers, connections)
+    except urllib.error.HTTPError as exc:
+        if exc.code == 304 and meta:
+            return path
+        raise
+
+    ensuredir(cachedir)
+    tmppath = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        with io.open(tmppath, 'wb') as f:
+            for chunk in iter(lambda: response.read(64 * 1024), b''):
+                f.write(chunk)
+
+        if integrity is not None and not _matches_integrity(
+                tmppath, integrity):
+            raise ValueError(
+                'Cannot use %r: integrity check failed, expected %s'
+                % (uri, integrity))
+
+        _replace(tmppath, path)
+    finally:
+        response.close()
+        if os.path.exists(tmppath):
+            os.remove(tmppath)
+
+    headers = response.info()
+    _write_atomic(metapath, json.dumps({
+        'uri': uri,
+        'etag': headers.get('ETag'),
+        'last-modified': headers.get('Last-Modified'),
+    }).encode('utf-8'))
+
+    return path
+
+
+def _request(uri, headers, connections, redirects=_FETCH_REDIRECTS):
+    """Send GET request over a kept connection, and return the response.
+
+    Connections are kept in *connections* by their origins. Unlike
+    ``urlopen()``, the response must be read till the end before the next
+    request is sent. Error responses raise ``HTTPError`` the same way.
+    """
+    parts = urllib.parse.urlsplit(uri)
+    target = parts.path or '/'
+    if parts.query:
+        target += '?' + parts.query
+
+    # Servers close idle connections whenever they like, so a request sent
+    # over a kept connection is sent once again over a new one if it fails.
+    origin = parts.scheme, parts.netloc
+    while True:
+        reused = origin in connections
+        if not reused:
+            if parts.scheme == 'https':
+                connections[origin] = http_client.HTTPSConnection(
+                    parts.netloc, timeout=60)
+            else:
+                connections[origin] = http_client.HTTPConnection(
+                    parts.netloc, timeout=60)
+        connection = connections[origin]
+
+        try:
+            connection.request('GET', target, headers=headers)
+            response = connection.getresponse()
+            break
+        except (http_client.HTTPException, socket.error):
+            connection.close()
+            del connections[origin]
+            if not reused:
+                raise
+
+    if response.status in (301, 302, 303, 307, 308) and redirects:
+        location = urllib.parse.urljoin(uri, response.getheader('Location'))
+        response.read()
+        return _request(location, headers, connections, redirects - 1)
+
+    if response.status >= 300:
+        response.read()
+        raise urllib.error.HTTPError(
+            uri, response.status, response.reason, response.msg, None)
+    return response
+
+
+def _gzip(data):
+    # Zero modification time in gzip header makes the output reproducible
+    # across builds.
+    buf = io.BytesIO()
+    with gzip.GzipFile(
+            filename='', mode='wb', fileobj=buf, compresslevel=9,
+            mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def _matches_integrity(path, integrity):
+    # Integrity is expected in Subresource Integrity format, i.e. a hash
+    # algorithm followed by base64 encoded digest (e.g. 'sha384-...').
+    algorithm, _, expected = integrity.partition('-')
+    digest = hashlib.new(algorithm)
+    with io.open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return base64.b64encode(digest.digest()).decode('ascii') == expected
+
+
+def main(argv=None):
+    """Build Sphinx docs, and render ReDoc pages again on changes."""
+    import argparse
+    from sphinx.application import Sphinx
+
+    parser = argparse.ArgumentParser(
+        prog='python -m sphinxcontrib.redoc', description=main.__doc__)
+    parser.add_argument('sourcedir')
+    parser.add_argument('outputdir')
+    parser.add_argument('-b', dest='builder', default='html',
+                        help='builder to use (default: %(default)s)')
+    parser.add_argument('-j', dest='jobs', type=int, default=0,
+                        help='build in parallel with N processes')
+    parser.add_argument('--interval', type=float, default=0.5,
+                        help='seconds between polls (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    app = Sphinx(
+        srcdir=args.sourcedir,
+        confdir=args.sourcedir,
+        outdir=args.outputdir,
+        doctreedir=os.path.join(args.outputdir, '.doctrees'),
+        buildername=args.builder,
+        parallel=args.jobs)
+    app.build()
+
+    _LOGGER.info('sphinxcontrib-redoc: watching for changes, press Ctrl+C '
+                 'to stop')
+    try:
+        watch(app, interval=args.interval)
+    except KeyboardInterrupt:
+        pass
+    return app.statuscode
 
 
 def setup(app):
     app.add_config_value('redoc', [], 'html')
     app.add_config_value('redoc_uri', None, 'html')
+    app.add_config_value('redoc_uri_integrity', None, 'html')
+    app.add_config_value('redoc_offline', False, 'html')
+    app.add_config_value('redoc_fetch', False, 'html')
+    app.add_config_value('redoc_assets_mode', 'copy', 'html')
+    app.add_config_value('redoc_compress', [], 'html')
+    app.add_config_value('redoc_cache', True, 'html')
+    app.add_config_value('redoc_cache_size', 256 * 1024 * 1024, 'html')
+    app.add_config_value('redoc_parallel', None, 'html')
+    app.add_config_value('redoc_parser', 'auto', 'html')
+    app.add_config_value('redoc_serializer', 'json', 'html')
+    app.add_config_value('redoc_fingerprint', False, 'html')
+
+    app.add_event('redoc-build-report')
 
+    app.add_directive('redoc', _RedocDirective)
+    app.add_node(
+        _redoc_frame,
+        html=(_visit_redoc_frame, None),
+        latex=(_skip_redoc_frame, None),
+        text=(_skip_redoc_frame, None),
+        man=(_skip_redoc_frame, None),
+        texinfo=(_skip_redoc_frame, None))
+    app.connect('env-purge-doc', _purge_redoc_pages)
+    app.connect('env-merge-info', _merge_redoc_pages)
+
+    app.connect('builder-inited', _note_build_all)
     app.connect('html-collect-pages', render)
     app.connect('build-finished', assets)
 
     version = pkg_resources.get_distribution('sphinxcontrib-redoc').version
-    return {'version': version, 'parallel_read_safe': True}
+    return {
+        'version': version,
+        'parallel_read_safe': True,
+        'parallel_write_safe': True,
+    }
+
+
+if __name__ == '__main__':
+    # The extension is loaded by Sphinx as 'sphinxcontrib.redoc', and it
+    # must be the very same module that watches for changes.
+    from sphinxcontrib import redoc
+    raise SystemExit(redoc.main())
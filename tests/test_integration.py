@@ -2,6 +2,14 @@ import os
 import textwrap
 import json
 import io
+import sys
+import gzip
+import base64
+import hashlib
+import multiprocessing
+import threading
+import time
+import tracemalloc
 
 import yaml
 import py
@@ -10,7 +18,9 @@ import pkg_resources
 import jinja2
 import bs4
 
+from six.moves import BaseHTTPServer, socketserver
 from sphinx.application import Sphinx
+from sphinxcontrib import redoc as extension
 
 
 here = os.path.abspath(os.path.dirname(__file__))
@@ -24,12 +34,17 @@ def run_sphinx(tmpdir):
     spec = py.path.local(here).join('..', 'docs', '_specs', 'github.yml')
     spec.copy(src.mkdir('_specs').join('github.yml'))
 
-    def run(redoc_overwrite=None, redoc_uri=None):
+    def run(redoc_overwrite=None, redoc_uri=None, redoc=None, parallel=0,
+            buildername='html', freshenv=False, force_all=False,
+            **confoverrides):
         conf = {'name': 'Github API (v3)',
                 'page': 'api/github/index',
                 'spec': '_specs/github.yml'}
         conf.update(redoc_overwrite or {})
 
+        if redoc is None:
+            redoc = [conf]
+
         confpy = jinja2.Template(textwrap.dedent('''
             import os
 
@@ -41,22 +56,85 @@ def run_sphinx(tmpdir):
             master_doc = 'index'
             redoc = {{ redoc }}
             redoc_uri = {{ redoc_uri }}
-        ''')).render(redoc=[conf], redoc_uri=repr(redoc_uri))
+        ''')).render(redoc=redoc, redoc_uri=repr(redoc_uri))
 
         src.join('conf.py').write_text(confpy, encoding='utf-8')
         src.join('index.rst').ensure()
 
+        status = io.StringIO()
         Sphinx(
             srcdir=src.strpath,
             confdir=src.strpath,
             outdir=out.strpath,
             doctreedir=out.join('.doctrees').strpath,
-            buildername='html'
-        ).build()
+            buildername=buildername,
+            confoverrides=confoverrides,
+            parallel=parallel,
+            status=status,
+            freshenv=freshenv,
+        ).build(force_all=force_all)
+
+        return status.getvalue()
 
     yield run
 
 
+def _stored(tmpdir, name):
+    # Specs are stored under names derived from their content, and the
+    # manifest maps original names to them.
+    manifest = json.loads(tmpdir.join('out', 'redoc-manifest.json').read())
+    return tmpdir.join('out', manifest[name])
+
+
+@pytest.fixture(scope='function')
+def http_server():
+    class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+        daemon_threads = True
+
+        def url(self, path):
+            return 'http://%s:%d%s' % (self.server_address + (path,))
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+        # Connections are kept alive unless clients ask to close them.
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.server.requests.append((self.path, dict(self.headers)))
+            self.server.connections.add(self.client_address)
+
+            if self.path not in self.server.resources:
+                self.send_error(404)
+                return
+
+            body = self.server.resources[self.path]
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = Server(('127.0.0.1', 0), Handler)
+    server.resources, server.requests, server.connections = {}, [], set()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
 def test_redocjs_lib_is_copied(run_sphinx, tmpdir):
     outdir = tmpdir.join('out')
     extdir = py.path.local(
@@ -69,30 +147,1052 @@ def test_redocjs_lib_is_copied(run_sphinx, tmpdir):
         == extdir.join('redoc.js').computehash()
 
 
-def test_redocjs_lib_is_downloaded(run_sphinx, tmpdir):
+@pytest.mark.parametrize(['mode'], [
+    pytest.param('copy', id='copy'),
+    pytest.param('hardlink', id='hardlink'),
+    pytest.param('reflink', id='reflink'),
+])
+def test_redocjs_lib_assets_mode(run_sphinx, tmpdir, mode):
+    redocjs = tmpdir.join('out', '_static', 'redoc.js')
+    extdir = py.path.local(
+        pkg_resources.get_provider('sphinxcontrib.redoc').module_path)
+
+    run_sphinx(redoc_assets_mode=mode)
+
+    assert redocjs.computehash() == extdir.join('redoc.js').computehash()
+
+    # Hardlinks cannot cross filesystem boundaries, in which case the bundle
+    # is expected to be copied.
+    linkable = tmpdir.stat().dev == extdir.stat().dev
+    assert os.path.samefile(redocjs.strpath, extdir.join('redoc.js').strpath) \
+        is (mode == 'hardlink' and linkable)
+
+
+def test_redocjs_lib_is_unlinked(run_sphinx, tmpdir):
+    redocjs = tmpdir.join('out', '_static', 'redoc.js')
+    extdir = py.path.local(
+        pkg_resources.get_provider('sphinxcontrib.redoc').module_path)
+
+    run_sphinx(redoc_assets_mode='hardlink')
+    run_sphinx(redoc_assets_mode='copy')
+
+    assert redocjs.computehash() == extdir.join('redoc.js').computehash()
+    assert not os.path.samefile(
+        redocjs.strpath, extdir.join('redoc.js').strpath)
+
+
+def test_redocjs_lib_is_not_copied_if_unchanged(run_sphinx, tmpdir,
+                                                monkeypatch):
+    redocjs = tmpdir.join('out', '_static', 'redoc.js')
+
+    run_sphinx()
+    inode = redocjs.stat().ino
+
+    def copy2(*args, **kwargs):
+        raise AssertionError('redoc.js must not be copied again')
+    monkeypatch.setattr('shutil.copy2', copy2)
+
+    run_sphinx()
+    assert redocjs.stat().ino == inode
+
+
+def test_redocjs_lib_is_replaced_if_changed(run_sphinx, tmpdir):
+    redocjs = tmpdir.join('out', '_static', 'redoc.js')
+    extdir = py.path.local(
+        pkg_resources.get_provider('sphinxcontrib.redoc').module_path)
+
+    run_sphinx()
+    redocjs.write_binary(b'x' * redocjs.size())
+    run_sphinx()
+
+    assert redocjs.computehash() == extdir.join('redoc.js').computehash()
+
+
+def test_redocjs_lib_is_downloaded(run_sphinx, tmpdir, http_server):
     outdir = tmpdir.join('out')
     extdir = py.path.local(
         pkg_resources.get_provider('sphinxcontrib.redoc').module_path)
+    http_server.resources['/redoc.standalone.js'] = b'/* redoc.js */'
 
-    run_sphinx(redoc_uri=(
-        'https://cdn.jsdelivr.net/npm/redoc@2.0.0-alpha.32/bundles'
-        '/redoc.standalone.js'))
+    run_sphinx(redoc_uri=http_server.url('/redoc.standalone.js'))
 
     assert outdir.join('_static', 'redoc.js').check()
     assert outdir.join('_static', 'redoc.js').computehash() \
         != extdir.join('redoc.js').computehash()
-    assert outdir.join('_static', 'redoc.js').computehash() \
-        == '6978103258cab653263b5b75c008b474'
+    assert outdir.join('_static', 'redoc.js').read_binary() \
+        == b'/* redoc.js */'
+
+
+def test_redocjs_lib_is_cached(run_sphinx, tmpdir, http_server):
+    redocjs = tmpdir.join('out', '_static', 'redoc.js')
+    http_server.resources['/redoc.js'] = b'/* redoc.js */'
+
+    run_sphinx(redoc_uri=http_server.url('/redoc.js'))
+    assert redocjs.read_binary() == b'/* redoc.js */'
+
+    redocjs.remove()
+    run_sphinx(redoc_uri=http_server.url('/redoc.js'))
+    assert redocjs.read_binary() == b'/* redoc.js */'
+
+    # The second request must be a conditional one, and since the bundle
+    # hasn't been changed, it must not be downloaded again.
+    assert len(http_server.requests) == 2
+    assert 'If-None-Match' not in http_server.requests[0][1]
+    assert 'If-None-Match' in http_server.requests[1][1]
+
+
+def test_redocjs_lib_is_updated(run_sphinx, tmpdir, http_server):
+    redocjs = tmpdir.join('out', '_static', 'redoc.js')
+
+    http_server.resources['/redoc.js'] = b'/* redoc.js v1 */'
+    run_sphinx(redoc_uri=http_server.url('/redoc.js'))
+
+    http_server.resources['/redoc.js'] = b'/* redoc.js v2 */'
+    run_sphinx(redoc_uri=http_server.url('/redoc.js'))
+
+    assert redocjs.read_binary() == b'/* redoc.js v2 */'
+
+
+def test_redocjs_lib_offline(run_sphinx, tmpdir, http_server):
+    redocjs = tmpdir.join('out', '_static', 'redoc.js')
+    http_server.resources['/redoc.js'] = b'/* redoc.js */'
+
+    with pytest.raises(Exception) as excinfo:
+        run_sphinx(redoc_uri=http_server.url('/redoc.js'), redoc_offline=True)
+    assert 'no cached copy is available' in str(excinfo.value)
+
+    run_sphinx(redoc_uri=http_server.url('/redoc.js'))
+    redocjs.remove()
+    run_sphinx(redoc_uri=http_server.url('/redoc.js'), redoc_offline=True)
+
+    assert redocjs.read_binary() == b'/* redoc.js */'
+    assert len(http_server.requests) == 1
+
+
+@pytest.mark.parametrize(['body', 'valid'], [
+    pytest.param(b'/* redoc.js */', True, id='valid'),
+    pytest.param(b'/* tampered */', False, id='invalid'),
+])
+def test_redocjs_lib_integrity(run_sphinx, tmpdir, http_server, body, valid):
+    redocjs = tmpdir.join('out', '_static', 'redoc.js')
+    integrity = 'sha384-' + base64.b64encode(
+        hashlib.sha384(b'/* redoc.js */').digest()).decode('ascii')
+    http_server.resources['/redoc.js'] = body
+
+    def run():
+        run_sphinx(
+            redoc_uri=http_server.url('/redoc.js'),
+            redoc_uri_integrity=integrity)
+
+    if valid:
+        run()
+        assert redocjs.read_binary() == body
+    else:
+        with pytest.raises(Exception) as excinfo:
+            run()
+        assert 'integrity check failed' in str(excinfo.value)
+
+
+def test_redocjs_lib_offline_integrity(run_sphinx, tmpdir, http_server):
+    http_server.resources['/redoc.js'] = b'/* tampered */'
+    run_sphinx(redoc_uri=http_server.url('/redoc.js'))
+
+    with pytest.raises(Exception) as excinfo:
+        run_sphinx(
+            redoc_uri=http_server.url('/redoc.js'),
+            redoc_uri_integrity='sha384-' + base64.b64encode(
+                hashlib.sha384(b'/* redoc.js */').digest()).decode('ascii'),
+            redoc_offline=True)
+    assert 'integrity check of cached copy failed' in str(excinfo.value)
+
+
+@pytest.mark.parametrize(['embed'], [
+    pytest.param(False, id='link'),
+    pytest.param(True, id='embed'),
+])
+def test_remote_spec_is_fetched(run_sphinx, tmpdir, http_server, embed):
+    for name in ('users', 'repos', 'teams'):
+        http_server.resources['/specs/%s.yml' % name] = (
+            u'openapi: 3.0.0\ninfo: {title: %s API}\n' % name.title()
+        ).encode('utf-8')
+
+    run_sphinx(redoc_fetch=True, redoc=[
+        {'page': 'api/%s' % name, 'embed': embed,
+         'spec': http_server.url('/specs/%s.yml' % name)}
+        for name in ('users', 'repos', 'teams')
+    ])
+
+    html = tmpdir.join('out', 'api', 'users.html').read()
+    assert http_server.url('/specs/users.yml') not in html
+    if embed:
+        spec = json.loads(
+            bs4.BeautifulSoup(html, 'html.parser').find(id='spec').string)
+        assert spec['info']['title'] == 'Users API'
+    else:
+        spec = _stored(tmpdir, '_specs/users.yml')
+        assert 'Users API' in spec.read()
+        assert '"../%s"' % spec.relto(tmpdir.join('out')) in html
+    assert len(http_server.requests) == 3
+
+
+def test_remote_spec_connections_are_reused(
+        run_sphinx, tmpdir, http_server, monkeypatch):
+    monkeypatch.setattr(extension, '_FETCH_THREADS', 1)
+    for name in ('users', 'repos', 'teams'):
+        http_server.resources['/specs/%s.yml' % name] = b'openapi: 3.0.0\n'
+
+    run_sphinx(redoc_fetch=True, redoc=[
+        {'page': 'api/%s' % name,
+         'spec': http_server.url('/specs/%s.yml' % name)}
+        for name in ('users', 'repos', 'teams')
+    ])
+
+    assert len(http_server.requests) == 3
+    assert len(http_server.connections) == 1
+
+
+def test_remote_spec_is_revalidated(run_sphinx, tmpdir, http_server):
+    page = tmpdir.join('out', 'api', 'github', 'index.html')
+    http_server.resources['/users.yml'] = b'openapi: 3.0.0\n'
+    conf = {'spec': http_server.url('/users.yml')}
+
+    run_sphinx(redoc_overwrite=conf, redoc_fetch=True)
+    page.write_text(u'sentinel', encoding='utf-8')
+    status = run_sphinx(redoc_overwrite=conf, redoc_fetch=True)
+
+    # Unchanged spec is neither downloaded nor rendered again.
+    assert 'If-None-Match' in http_server.requests[1][1]
+    assert '1 of 1 page(s) are up to date, skipped' in status
+    assert page.read() == 'sentinel'
+
+    http_server.resources['/users.yml'] = b'openapi: 3.0.1\n'
+    run_sphinx(redoc_overwrite=conf, redoc_fetch=True)
+
+    assert page.read() != 'sentinel'
+    assert _stored(tmpdir, '_specs/users.yml').read() == 'openapi: 3.0.1\n'
+
+
+def test_remote_spec_offline(run_sphinx, tmpdir, http_server):
+    http_server.resources['/users.yml'] = b'openapi: 3.0.0\n'
+    conf = {'spec': http_server.url('/users.yml'), 'embed': True}
+
+    with pytest.raises(Exception) as excinfo:
+        run_sphinx(redoc_overwrite=conf, redoc_fetch=True, redoc_offline=True)
+    assert 'no cached copy is available' in str(excinfo.value)
+
+    run_sphinx(redoc_overwrite=conf, redoc_fetch=True)
+    tmpdir.join('out', 'api', 'github', 'index.html').remove()
+    run_sphinx(redoc_overwrite=conf, redoc_fetch=True, redoc_offline=True)
+
+    assert tmpdir.join('out', 'api', 'github', 'index.html').check()
+    assert len(http_server.requests) == 1
+
+
+def test_local_spec_named_like_url_is_not_fetched(
+        run_sphinx, tmpdir, http_server):
+    tmpdir.join('src', 'httpbin.yml').write_text(
+        u'openapi: 3.0.0\ninfo: {title: Local API}\n', encoding='utf-8')
+
+    run_sphinx(redoc_overwrite={'spec': 'httpbin.yml', 'embed': True},
+               redoc_fetch=True)
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    assert 'Local API' in html
+    assert http_server.requests == []
+
+
+def test_remote_spec_is_not_fetched(run_sphinx, tmpdir, http_server):
+    run_sphinx(redoc_overwrite={'spec': http_server.url('/users.yml')})
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    assert http_server.url('/users.yml') in html
+    assert http_server.requests == []
 
 
 def test_openapi_spec_is_copied(run_sphinx, tmpdir):
-    srcdir, outdir = tmpdir.join('src'), tmpdir.join('out')
+    srcdir = tmpdir.join('src')
+
+    run_sphinx()
+
+    spec = _stored(tmpdir, '_specs/github.yml')
+    assert spec.check()
+    assert spec.computehash() == \
+        srcdir.join('_specs', 'github.yml').computehash()
+    assert spec.basename == 'github.%s.yml' % (
+        hashlib.sha256(spec.read_binary()).hexdigest()[:12])
+
+
+def test_openapi_spec_is_updated(run_sphinx, tmpdir):
+    srcdir = tmpdir.join('src')
 
     run_sphinx()
+    previous = _stored(tmpdir, '_specs/github.yml')
+    srcdir.join('_specs', 'github.yml').write_text(
+        u'openapi: 3.0.0\n', encoding='utf-8')
+    run_sphinx()
+
+    assert _stored(tmpdir, '_specs/github.yml').read() == 'openapi: 3.0.0\n'
+
+    # Files that no page refers to are removed.
+    assert not previous.check()
+    assert tmpdir.join('out', '_specs').listdir() == \
+        [_stored(tmpdir, '_specs/github.yml')]
+
+
+def test_openapi_spec_is_stored_once(run_sphinx, tmpdir):
+    srcdir = tmpdir.join('src')
+    srcdir.join('_specs', 'github.yml').copy(
+        srcdir.mkdir('v2').join('github.yml'))
+    srcdir.join('v3', 'github.yml').write_text(
+        u'openapi: 3.0.0\n', encoding='utf-8', ensure=True)
+
+    run_sphinx(redoc=[
+        {'page': 'api/v1', 'spec': '_specs/github.yml'},
+        {'page': 'api/v1-again', 'spec': '_specs/github.yml'},
+        {'page': 'api/v2', 'spec': 'v2/github.yml'},
+        {'page': 'api/v3', 'spec': 'v3/github.yml'},
+    ])
+
+    # Specs of the same content share the file, while specs of the same
+    # name do not overwrite each other.
+    specs = sorted(
+        f.read() for f in tmpdir.join('out', '_specs').listdir())
+    assert specs == sorted([
+        srcdir.join('_specs', 'github.yml').read(), 'openapi: 3.0.0\n'])
+
+
+def test_stale_specs_are_pruned(run_sphinx, tmpdir):
+    run_sphinx(redoc_overwrite={'shard': True}, redoc_compress=['gzip'])
+    tmpdir.join('out', '_specs', 'other.yml').write_text(
+        u'sentinel', encoding='utf-8')
+
+    run_sphinx(redoc_overwrite={'page': 'api/other'})
+
+    # Shards, their sidecars and directories are gone, while files that are
+    # not written by the extension are never touched.
+    spec = _stored(tmpdir, '_specs/github.yml').basename
+    assert sorted(f.basename for f in tmpdir.join('out', '_specs').listdir()) \
+        == sorted(['other.yml', spec])
+    assert json.loads(tmpdir.join(
+        'out', '.doctrees', 'redoc', 'fingerprints.json').read()).keys() == \
+        {'api/other'}
+
+
+@pytest.mark.parametrize('parallel', [1, 2])
+def test_openapi_spec_is_minified(run_sphinx, tmpdir, parallel):
+    run_sphinx(redoc_overwrite={'minify': True}, redoc_parallel=parallel)
+
+    with io.open(tmpdir.join('src', '_specs', 'github.yml').strpath,
+                 encoding='utf-8') as f:
+        spec = yaml.safe_load(f)
+
+    minified = _stored(tmpdir, '_specs/github.json').read()
+    assert json.loads(minified) == spec
+    assert minified == json.dumps(
+        spec, separators=(',', ':')).replace('</', '<\\/')
+    assert len(tmpdir.join('out', '_specs').listdir()) == 1
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    assert '"../../%s"' % _stored(
+        tmpdir, '_specs/github.json').relto(tmpdir.join('out')) in html
+
+
+def test_fingerprinted_files(run_sphinx, tmpdir):
+    run_sphinx(redoc_fingerprint=True)
 
-    assert outdir.join('_specs', 'github.yml').check()
-    assert outdir.join('_specs', 'github.yml').computehash() \
-        == srcdir.join('_specs', 'github.yml').computehash()
+    manifest = json.loads(tmpdir.join('out', 'redoc-manifest.json').read())
+    assert sorted(manifest) == ['_specs/github.yml', '_static/redoc.js']
+
+    redocjs = tmpdir.join('out', manifest['_static/redoc.js'])
+    spec = tmpdir.join('out', manifest['_specs/github.yml'])
+    assert redocjs.basename.startswith('redoc.')
+    assert redocjs.read() == tmpdir.join('out', '_static', 'redoc.js').read()
+    assert spec.read() == tmpdir.join('src', '_specs', 'github.yml').read()
+    assert manifest['_specs/github.yml'] == '_specs/github.%s.yml' % (
+        hashlib.sha256(spec.read_binary()).hexdigest()[:12])
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    assert '"../../%s"' % manifest['_static/redoc.js'] in html
+    assert '"../../%s"' % manifest['_specs/github.yml'] in html
+
+    # Pages that are up to date are in the manifest too.
+    run_sphinx(redoc_fingerprint=True)
+    assert json.loads(
+        tmpdir.join('out', 'redoc-manifest.json').read()) == manifest
+
+    run_sphinx()
+    assert sorted(json.loads(
+        tmpdir.join('out', 'redoc-manifest.json').read())) == \
+        ['_specs/github.yml']
+
+
+def test_fingerprinted_bundle(run_sphinx, tmpdir, http_server):
+    http_server.resources['/redoc.js'] = b'/* redoc.js v1 */'
+    run_sphinx(redoc_uri=http_server.url('/redoc.js'), redoc_fingerprint=True,
+               redoc_compress=['gzip'])
+
+    # The bundle is fetched once per build, even though both pages and
+    # assets need it.
+    assert len(http_server.requests) == 1
+    manifest = json.loads(tmpdir.join('out', 'redoc-manifest.json').read())
+    previous = tmpdir.join('out', manifest['_static/redoc.js'])
+    assert py.path.local(previous.strpath + '.gz').check()
+
+    http_server.resources['/redoc.js'] = b'/* redoc.js v2 */'
+    run_sphinx(redoc_uri=http_server.url('/redoc.js'), redoc_fingerprint=True)
+
+    # Superseded bundle is removed along with its sidecars.
+    assert len(http_server.requests) == 2
+    manifest = json.loads(tmpdir.join('out', 'redoc-manifest.json').read())
+    assert tmpdir.join('out', manifest['_static/redoc.js']).read() == \
+        '/* redoc.js v2 */'
+    assert not previous.check()
+    assert not py.path.local(previous.strpath + '.gz').check()
+
+
+def test_fingerprinted_shards(run_sphinx, tmpdir):
+    run_sphinx(redoc_overwrite={'shard': True}, redoc_fingerprint=True)
+
+    manifest = json.loads(tmpdir.join('out', 'redoc-manifest.json').read())
+    index = json.loads(
+        tmpdir.join('out', manifest['_specs/github/index.json']).read())
+    shards = index['x-redoc-shards']
+
+    base = tmpdir.join('out', '_specs', 'github')
+    for i, tag in enumerate(shards['tags']):
+        assert base.join(tag['url']).strpath == tmpdir.join(
+            'out', manifest['_specs/github/tags/%d.json' % i]).strpath
+        assert base.join(tag['url']).check()
+        for url in tag['shared']:
+            assert base.join(url).check()
+
+
+def test_openapi_spec_skeleton(run_sphinx, tmpdir):
+    tmpdir.join('src', '_specs', 'github.yml').write_text(textwrap.dedent(u'''\
+        openapi: 3.0.0
+        info: {title: Users <API>, version: '1.0'}
+        tags:
+          - name: users
+            description: Users & members.
+        paths:
+          /users:
+            get: {tags: [users], operationId: listUsers, summary: List}
+            post: {tags: [users], summary: <script>alert(1)</script>}
+          /ping:
+            get: {operationId: ping, deprecated: true}
+        '''), encoding='utf-8')
+
+    run_sphinx(redoc_overwrite={'skeleton': True})
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    redoc = bs4.BeautifulSoup(html, 'html.parser').find('redoc')
+
+    assert redoc.find('h1').text == 'Users <API> (1.0)'
+    assert [a['href'] for a in redoc.find('nav').find_all('a')] == [
+        '#operation/ping', '#tag/users', '#operation/listUsers',
+        '#tag/users']
+    assert redoc.find(id='tag/users').find('p').text == 'Users & members.'
+    assert redoc.find(id='operation/listUsers').find('code').text == \
+        'GET /users'
+    assert redoc.find(id='operation/ping')['class'] == ['deprecated']
+    assert redoc.find(id='operation/ping').find('h3').text.strip() == \
+        'GET /ping'
+    assert '<script>alert' not in html
+
+
+def test_openapi_spec_skeleton_is_off(run_sphinx, tmpdir):
+    run_sphinx()
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    assert 'redoc-outline' not in html
+
+
+_SEARCH_SPEC = textwrap.dedent(u'''\
+    openapi: 3.0.0
+    info: {title: Users API, version: '1.0'}
+    paths:
+      /users:
+        get:
+          operationId: listUsers
+          summary: List users
+          description: |
+            Returns all the users.
+
+            Users are paginated.
+        post: {operationId: createUser}
+    ''')
+
+
+def test_openapi_spec_search_index(run_sphinx, tmpdir):
+    tmpdir.join('src', '_specs', 'github.yml').write_text(
+        _SEARCH_SPEC, encoding='utf-8')
+
+    run_sphinx(redoc_overwrite={'search': {'index': True}})
+
+    index = json.loads(_stored(tmpdir, '_specs/github.search.json').read())
+    assert index == {
+        'title': 'Users API',
+        'fields': [
+            'id', 'method', 'path', 'operationId', 'summary', 'description'],
+        'operations': [
+            ['operation/listUsers', 'GET', '/users', 'listUsers',
+             'List users', 'Returns all the users.'],
+            ['operation/createUser', 'POST', '/users', 'createUser', None,
+             None],
+        ],
+    }
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    link = bs4.BeautifulSoup(html, 'html.parser').find(
+        id='redoc-search-index')
+    assert link['href'] == '../../' + _stored(
+        tmpdir, '_specs/github.search.json').relto(tmpdir.join('out'))
+
+
+def test_openapi_spec_search_sphinx(run_sphinx, tmpdir):
+    tmpdir.join('src', '_specs', 'github.yml').write_text(
+        _SEARCH_SPEC, encoding='utf-8')
+    searchindex = tmpdir.join('out', 'searchindex.js')
+
+    def titles():
+        index = json.loads(searchindex.read()[len('Search.setIndex('):-1])
+        docindex = index['docnames'].index('api/github/index')
+        return index['titles'][docindex], sorted(
+            (title, entry[1]) for title, entries in index['alltitles'].items()
+            for entry in entries if entry[0] == docindex)
+
+    run_sphinx(redoc_overwrite={'search': {'sphinx': True}})
+
+    assert '_specs/github.search.json' not in json.loads(
+        tmpdir.join('out', 'redoc-manifest.json').read())
+    assert titles() == ('Github API (v3)', [
+        ('Github API (v3)', None),
+        ('List users', 'operation/listUsers'),
+        ('POST /users', 'operation/createUser'),
+    ])
+
+    # Sphinx writes its search index from scratch, so pages that are up to
+    # date must be fed to it on every build.
+    status = run_sphinx(redoc_overwrite={'search': {'sphinx': True}})
+    assert '1 of 1 page(s) are up to date' in status
+    assert titles()[0] == 'Github API (v3)'
+
+
+def test_openapi_spec_search_is_off(run_sphinx, tmpdir):
+    run_sphinx()
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    assert 'redoc-search-index' not in html
+    searchindex = tmpdir.join('out', 'searchindex.js').read()
+    assert 'api/github/index' not in searchindex
+
+
+def test_openapi_spec_is_sharded(run_sphinx, tmpdir):
+    specdir = tmpdir.join('out', '_specs', 'github')
+
+    run_sphinx(redoc_overwrite={'shard': True})
+
+    html = tmpdir.join('out').join('api', 'github', 'index.html').read()
+    indexfile = _stored(tmpdir, '_specs/github/index.json')
+    assert '"../../%s"' % indexfile.relto(tmpdir.join('out')) in html
+
+    index = json.loads(indexfile.read())
+    shards = index.pop('x-redoc-shards')
+    with io.open(tmpdir.join('src', '_specs', 'github.yml').strpath,
+                 encoding='utf-8') as f:
+        original = yaml.safe_load(f)
+
+    # The index lists all operations, but not their details.
+    assert sorted(index['paths']) == sorted(original['paths'])
+    assert 'parameters' not in index['paths']['/users']['get']
+
+    # Merging all chunks back must result in the very same spec, except for
+    # objects no operation refers to.
+    spec = index
+    for url in set(url for tag in shards['tags'] for url in tag['shared']):
+        for section, objects in json.loads(specdir.join(url).read()).items():
+            spec.setdefault(section, {}).update(objects)
+    for tag in shards['tags']:
+        chunk = json.loads(specdir.join(tag['url']).read())
+        for path, item in chunk['paths'].items():
+            spec['paths'][path].update(item)
+
+    reachable = extension._reachable(original)
+    original['definitions'] = dict(
+        (name, value) for name, value in original['definitions'].items()
+        if ('definitions', name) in reachable)
+    assert spec == original
+
+
+def test_openapi_spec_is_sharded_by_tags(run_sphinx, tmpdir):
+    specdir = tmpdir.join('out', '_specs', 'github')
+    tmpdir.join('src', '_specs', 'github.yml').write_text(textwrap.dedent(u'''\
+        openapi: 3.0.0
+        tags:
+          - name: users
+          - name: repos
+        paths:
+          /repos:
+            get: {tags: [repos], operationId: listRepos}
+          /users:
+            parameters: [{$ref: '#/components/parameters/Page'}]
+            get: {tags: [users], operationId: listUsers}
+            post: {tags: [repos, users], operationId: createUser}
+            delete: {operationId: deleteUsers}
+          /teams: {$ref: '#/x-paths/teams'}
+        x-paths:
+          teams:
+            get:
+              tags: [repos]
+              operationId: listTeams
+              responses:
+                '200': {$ref: '#/components/responses/Teams'}
+        components:
+          parameters:
+            Page: {name: page, in: query}
+          responses:
+            Teams: {description: OK}
+            Unused: {description: Unused}
+        '''), encoding='utf-8')
+
+    run_sphinx(redoc_overwrite={'shard': True})
+
+    shards = json.loads(
+        _stored(tmpdir, '_specs/github/index.json').read())['x-redoc-shards']
+    chunks = [json.loads(specdir.join(tag['url']).read())
+              for tag in shards['tags']]
+    params = [{'$ref': '#/components/parameters/Page'}]
+
+    assert [tag['name'] for tag in shards['tags']] == ['users', 'repos', '']
+    assert chunks == [
+        {'paths': {'/users': {
+            'parameters': params,
+            'get': {'tags': ['users'], 'operationId': 'listUsers'}}}},
+        {'paths': {
+            '/repos': {
+                'get': {'tags': ['repos'], 'operationId': 'listRepos'}},
+            '/teams': {
+                'get': {'tags': ['repos'], 'operationId': 'listTeams',
+                        'responses': {'200': {
+                            '$ref': '#/components/responses/Teams'}}}},
+            '/users': {
+                'parameters': params,
+                'post': {'tags': ['repos', 'users'],
+                         'operationId': 'createUser'}}}},
+        {'paths': {'/users': {
+            'parameters': params,
+            'delete': {'operationId': 'deleteUsers'}}}},
+    ]
+
+    # Objects are grouped by tags that refer to them, so every tag loads
+    # objects it needs only.
+    page = {'components': {'parameters': {
+        'Page': {'name': 'page', 'in': 'query'}}}}
+    teams = {'components': {'responses': {'Teams': {'description': 'OK'}}}}
+    assert [[json.loads(specdir.join(url).read()) for url in tag['shared']]
+            for tag in shards['tags']] == [[page], [page, teams], [page]]
+
+
+def test_openapi_spec_shards_are_tracked(run_sphinx, tmpdir):
+    page = tmpdir.join('out', 'api', 'github', 'index.html')
+
+    run_sphinx(redoc_overwrite={'shard': True})
+    page.write_text(u'sentinel', encoding='utf-8')
+    _stored(tmpdir, '_specs/github/tags/0.json').remove()
+    run_sphinx(redoc_overwrite={'shard': True})
+
+    assert page.read() != 'sentinel'
+    assert _stored(tmpdir, '_specs/github/tags/0.json').check()
+
+
+def _write_bundle_specs(tmpdir):
+    specs = tmpdir.join('src', '_specs')
+    specs.join('api.yml').write(textwrap.dedent('''\
+        openapi: 3.0.0
+        info: {title: Bundled, version: '1.0'}
+        paths:
+          /users:
+            get:
+              parameters:
+                - $ref: 'common.yml#/components/parameters/Limit'
+              responses:
+                '200':
+                  description: OK
+                  content:
+                    application/json:
+                      schema: {$ref: 'models/user.yml'}
+          /admins:
+            get:
+              responses:
+                '200':
+                  description: OK
+                  content:
+                    application/json:
+                      schema: {$ref: 'models/admin.yml'}
+    '''))
+    specs.join('common.yml').write(textwrap.dedent('''\
+        components:
+          parameters:
+            Limit: {name: limit, in: query, schema: {type: integer}}
+    '''))
+    specs.mkdir('models')
+    specs.join('models', 'user.yml').write(
+        'type: object\nproperties: {name: {type: string}}\n')
+    specs.join('models', 'admin.yml').write(
+        'type: object\nproperties: {name: {type: string}}\n')
+
+
+def test_openapi_spec_is_bundled(run_sphinx, tmpdir):
+    _write_bundle_specs(tmpdir)
+    run_sphinx(redoc_overwrite={'spec': '_specs/api.yml', 'bundle': True})
+
+    bundled = json.loads(_stored(tmpdir, '_specs/api.json').read())
+    get = bundled['paths']['/users']['get']
+    schema = lambda op: (  # noqa
+        op['responses']['200']['content']['application/json']['schema'])
+
+    assert get['parameters'] == [{'$ref': '#/components/parameters/Limit'}]
+    assert bundled['components']['parameters']['Limit']['name'] == 'limit'
+
+    # Identical objects are hoisted only once.
+    assert schema(get) == {'$ref': '#/components/schemas/user'}
+    assert schema(bundled['paths']['/admins']['get']) == \
+        {'$ref': '#/components/schemas/user'}
+    assert list(bundled['components']['schemas']) == ['user']
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    assert '"../../%s"' % _stored(
+        tmpdir, '_specs/api.json').relto(tmpdir.join('out')) in html
+
+
+def test_openapi_spec_is_bundled_embedded(run_sphinx, tmpdir):
+    _write_bundle_specs(tmpdir)
+    run_sphinx(redoc_overwrite={
+        'spec': '_specs/api.yml', 'bundle': True, 'embed': True})
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    assert 'common.yml' not in html
+    assert '#/components/parameters/Limit' in html
+    assert not tmpdir.join('out', '_specs').check()
+
+
+def test_openapi_spec_is_bundled_kinds(run_sphinx, tmpdir):
+    specs = tmpdir.join('src', '_specs')
+    specs.join('api.yml').write(textwrap.dedent('''\
+        openapi: 3.0.0
+        info: {title: Bundled, version: '1.0'}
+        paths:
+          /pets: {$ref: 'paths/pets.yml'}
+    '''))
+    specs.join('paths', 'pets.yml').write(textwrap.dedent('''\
+        get:
+          operationId: listPets
+          responses:
+            '2XX': {$ref: '../common.yml#/Pets'}
+            default:
+              description: Error
+              headers:
+                X-Rate-Limit: {$ref: '../common.yml#/RateLimit'}
+              content:
+                application/json:
+                  examples:
+                    error: {$ref: '../common.yml#/Error'}
+    '''), ensure=True)
+    specs.join('common.yml').write(textwrap.dedent('''\
+        Pets:
+          description: OK
+          headers:
+            X-Rate-Limit: {$ref: '#/RateLimit'}
+        RateLimit: {schema: {type: integer}}
+        Error: {value: {message: Oops}}
+    '''))
+
+    run_sphinx(redoc_overwrite={'spec': '_specs/api.yml', 'bundle': True})
+
+    bundled = json.loads(_stored(tmpdir, '_specs/api.json').read())
+    get = bundled['paths']['/pets']['get']
+
+    # Path items are inlined, as they are not reusable objects, while other
+    # objects are hoisted according to maps they are in.
+    assert get['operationId'] == 'listPets'
+    assert get['responses']['2XX'] == \
+        {'$ref': '#/components/responses/common_Pets'}
+    assert get['responses']['default']['headers']['X-Rate-Limit'] == \
+        {'$ref': '#/components/headers/common_RateLimit'}
+    assert get['responses']['default']['content']['application/json'][
+        'examples']['error'] == {'$ref': '#/components/examples/common_Error'}
+    assert sorted(bundled['components']) == \
+        ['examples', 'headers', 'responses']
+    assert bundled['components']['responses']['common_Pets']['headers'] == \
+        {'X-Rate-Limit': {'$ref': '#/components/headers/common_RateLimit'}}
+
+    status = run_sphinx(
+        redoc_overwrite={'spec': '_specs/api.yml', 'bundle': True})
+    assert '1 of 1 page(s) are up to date, skipped' in status
+    specs.join('paths', 'pets.yml').write('get: {operationId: changed}\n')
+    run_sphinx(redoc_overwrite={'spec': '_specs/api.yml', 'bundle': True})
+
+    bundled = json.loads(_stored(tmpdir, '_specs/api.json').read())
+    assert bundled['paths']['/pets']['get']['operationId'] == 'changed'
+
+
+def test_openapi_spec_is_bundled_dependencies(run_sphinx, tmpdir):
+    _write_bundle_specs(tmpdir)
+    conf = {'spec': '_specs/api.yml', 'bundle': True}
+    page = tmpdir.join('out', 'api', 'github', 'index.html')
+
+    run_sphinx(redoc_overwrite=conf)
+    page.write_text(u'sentinel', encoding='utf-8')
+    run_sphinx(redoc_overwrite=conf)
+    assert page.read() == 'sentinel'
+
+    tmpdir.join('src', '_specs', 'common.yml').write(
+        'components:\n  parameters:\n'
+        '    Limit: {name: count, in: query, schema: {type: integer}}\n')
+    run_sphinx(redoc_overwrite=conf)
+
+    assert page.read() != 'sentinel'
+    bundled = json.loads(_stored(tmpdir, '_specs/api.json').read())
+    assert bundled['components']['parameters']['Limit']['name'] == 'count'
+
+
+_FILTER_SPEC = textwrap.dedent(u'''\
+    openapi: 3.0.0
+    info: {title: Store API, version: '1.0'}
+    tags: [{name: pets}, {name: admin}, {name: health}]
+    x-tagGroups:
+      - {name: Store, tags: [pets, admin]}
+      - {name: Misc, tags: [health]}
+    paths:
+      /pets:
+        x-audience: public
+        get:
+          tags: [pets]
+          responses:
+            '200':
+              description: OK
+              content:
+                application/json:
+                  schema: {$ref: '#/components/schemas/Pets'}
+        delete:
+          tags: [pets, admin]
+          responses: {'204': {description: Deleted}}
+      /pets/{id}:
+        get:
+          tags: [pets]
+          x-audience: partner
+          responses:
+            '200':
+              description: OK
+              content:
+                application/json:
+                  schema: {$ref: '#/components/schemas/Pet'}
+      /status:
+        get:
+          tags: [health]
+          responses: {'200': {$ref: '#/components/responses/Status'}}
+    components:
+      schemas:
+        Pets: {type: array, items: {$ref: '#/components/schemas/Pet'}}
+        Pet:
+          oneOf: [{$ref: '#/components/schemas/Cat'}]
+          discriminator: {propertyName: kind, mapping: {dog: Dog}}
+        Cat: {type: object}
+        Dog: {type: object}
+        Internal: {type: object}
+      responses:
+        Status: {description: OK}
+      securitySchemes:
+        token: {type: http, scheme: bearer}
+    ''')
+
+
+def test_openapi_spec_is_filtered(run_sphinx, tmpdir):
+    tmpdir.join('src', '_specs', 'github.yml').write_text(
+        _FILTER_SPEC, encoding='utf-8')
+    criteria = {
+        'include': {'extensions': {'x-audience': 'public'},
+                    'paths': ['/status']},
+        'exclude': {'tags': ['admin']},
+    }
+
+    run_sphinx(redoc_overwrite={'filter': criteria})
+
+    manifest = json.loads(tmpdir.join('out', 'redoc-manifest.json').read())
+    assert list(manifest) == ['_specs/github.%s.json' % hashlib.sha256(
+        json.dumps(criteria, sort_keys=True).encode('utf-8')
+    ).hexdigest()[:8]]
+    spec = json.loads(tmpdir.join('out', list(manifest.values())[0]).read())
+
+    # Path items are public, while operations may override that.
+    assert sorted(
+        (path, method) for path, item in spec['paths'].items()
+        for method in item if not method.startswith('x-')) == \
+        [('/pets', 'get'), ('/status', 'get')]
+    assert spec['tags'] == [{'name': 'pets'}, {'name': 'health'}]
+    assert spec['x-tagGroups'] == [
+        {'name': 'Store', 'tags': ['pets']},
+        {'name': 'Misc', 'tags': ['health']},
+    ]
+
+    # Objects are kept if they are referred, even if only by other objects
+    # or by discriminator mapping.
+    assert sorted(spec['components']['schemas']) == \
+        ['Cat', 'Dog', 'Pet', 'Pets']
+    assert list(spec['components']['responses']) == ['Status']
+    assert list(spec['components']['securitySchemes']) == ['token']
+
+
+def test_openapi_spec_is_filtered_swagger2(run_sphinx, tmpdir):
+    tmpdir.join('src', '_specs', 'github.yml').write_text(textwrap.dedent(u'''\
+        swagger: '2.0'
+        paths:
+          /users:
+            get:
+              parameters: [{$ref: '#/parameters/Page'}]
+              responses: {'200': {$ref: '#/responses/Users'}}
+          /admin/users:
+            get:
+              responses: {'200': {$ref: '#/responses/Admins'}}
+        parameters:
+          Page: {name: page, in: query, type: integer}
+        responses:
+          Users: {description: OK, schema: {$ref: '#/definitions/User'}}
+          Admins: {description: OK, schema: {$ref: '#/definitions/Admin'}}
+        definitions:
+          User: {type: object}
+          Admin: {type: object}
+        '''), encoding='utf-8')
+
+    run_sphinx(redoc_overwrite={
+        'filter': {'exclude': {'paths': ['/admin/']}}, 'embed': True})
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    spec = json.loads(
+        bs4.BeautifulSoup(html, 'html.parser').find(id='spec').string)
+    assert list(spec['paths']) == ['/users']
+    assert list(spec['parameters']) == ['Page']
+    assert list(spec['responses']) == ['Users']
+    assert list(spec['definitions']) == ['User']
+
+
+def test_openapi_spec_is_filtered_path_refs(run_sphinx, tmpdir):
+    tmpdir.join('src', '_specs', 'github.yml').write_text(textwrap.dedent(u'''\
+        openapi: 3.0.0
+        paths:
+          /pets: {$ref: '#/x-paths/pets'}
+          /admin: {$ref: '#/x-paths/admin'}
+        x-paths:
+          pets:
+            get: {tags: [pets], operationId: listPets}
+          admin:
+            get: {tags: [admin], operationId: listAdmins}
+        '''), encoding='utf-8')
+
+    run_sphinx(redoc_overwrite={
+        'filter': {'include': {'tags': ['pets']}}, 'embed': True})
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    spec = json.loads(
+        bs4.BeautifulSoup(html, 'html.parser').find(id='spec').string)
+    assert spec['paths'] == {
+        '/pets': {'get': {'tags': ['pets'], 'operationId': 'listPets'}}}
+    assert 'listAdmins' not in html
+
+
+def test_openapi_spec_is_filtered_external(run_sphinx, tmpdir, http_server):
+    conf = {'spec': http_server.url('/users.yml'),
+            'filter': {'include': {'tags': ['users']}}}
+
+    with pytest.raises(ValueError) as excinfo:
+        run_sphinx(redoc_overwrite=conf)
+    assert str(excinfo.value) == (
+        'Improper configuration for sphinxcontrib-redoc at 0.filter: filter '
+        'is supported for external specs along with redoc_fetch only')
+
+    http_server.resources['/users.yml'] = _DIRECTIVE_SPEC.encode('utf-8')
+    run_sphinx(redoc_overwrite=dict(conf, embed=True), redoc_fetch=True)
+
+    html = tmpdir.join('out', 'api', 'github', 'index.html').read()
+    assert 'listUsers' in html
+    assert 'listRepos' not in html
+
+
+def test_openapi_spec_is_filtered_once(run_sphinx, tmpdir):
+    tmpdir.join('src', '_specs', 'github.yml').write_text(
+        _FILTER_SPEC, encoding='utf-8')
+    conf = {'page': 'api/public', 'spec': '_specs/github.yml',
+            'filter': {'include': {'tags': ['pets']}}}
+
+    run_sphinx(redoc=[
+        conf,
+        dict(conf, page='api/public-embedded', embed=True),
+        dict(conf, page='api/health',
+             filter={'include': {'tags': ['health']}}),
+    ])
+
+    # Pages that filter the same spec the same way share the result, and
+    # the spec is parsed once anyway.
+    report = json.loads(tmpdir.join('out', 'redoc-build-report.json').read())
+    assert [m['cache'] for m in report['pages']] == [None, 'hit', None]
+    assert report['pages'][0]['read_seconds'] > 0
+    assert report['pages'][2]['read_seconds'] == 0
+
+    html = tmpdir.join('out', 'api', 'public-embedded.html').read()
+    spec = json.loads(
+        bs4.BeautifulSoup(html, 'html.parser').find(id='spec').string)
+    assert list(spec['paths']) == ['/pets', '/pets/{id}']
+
+
+def test_build_report(run_sphinx, tmpdir):
+    conf = {'name': 'Github API (v3)',
+            'page': 'api/github/index',
+            'spec': '_specs/github.yml'}
+    redoc = [conf, dict(conf, page='api/embedded', embed=True)]
+
+    run_sphinx(redoc=redoc)
+    report = json.loads(tmpdir.join('out', 'redoc-build-report.json').read())
+
+    assert [m['page'] for m in report['pages']] == \
+        ['api/github/index', 'api/embedded']
+    assert report['skipped'] == []
+    assert report['assets']['seconds'] >= report['assets']['bundle_seconds']
+
+    linked, embedded = report['pages']
+    spec = tmpdir.join('src', '_specs', 'github.yml').size()
+    assert linked['input_bytes'] == embedded['input_bytes'] == spec
+    assert linked['cache'] is None
+    assert linked['parse_seconds'] == 0
+    assert embedded['cache'] == 'miss'
+    assert embedded['parse_seconds'] > 0
+    assert embedded['serialize_seconds'] > 0
+    assert embedded['output_bytes'] == tmpdir.join(
+        'out', 'api', 'embedded.html').size()
+
+    tmpdir.join('out', 'api', 'embedded.html').remove()
+    status = run_sphinx(redoc=redoc)
+    report = json.loads(tmpdir.join('out', 'redoc-build-report.json').read())
+
+    assert report['skipped'] == ['api/github/index']
+    assert [m['cache'] for m in report['pages']] == ['hit']
+    assert '1 page(s) rendered in' in status
+
+
+def test_build_report_event(run_sphinx, tmpdir, monkeypatch):
+    tmpdir.join('src', 'collector.py').write(textwrap.dedent('''\
+        reports = []
+
+        def setup(app):
+            app.connect('redoc-build-report',
+                        lambda app, report: reports.append(report))
+    '''))
+    monkeypatch.syspath_prepend(tmpdir.join('src').strpath)
+
+    run_sphinx(extensions=['sphinxcontrib.redoc', 'collector'])
+
+    import collector
+    assert [m['page'] for m in collector.reports[0]['pages']] == \
+        ['api/github/index']
 
 
 @pytest.mark.parametrize('options, attributes', [
@@ -155,8 +1255,8 @@ def test_redocjs_page_is_generated(run_sphinx, tmpdir, options, attributes):
     assert soup.script.attrs['src'] == os.path.join(
         '..', '..', '_static', 'redoc.js')
 
-    assert os.path.join('..', '..', '_specs', 'github.yml') \
-        in soup.find_all('script')[-1].string
+    assert '"../../%s"' % _stored(tmpdir, '_specs/github.yml').relto(
+        tmpdir.join('out')) in soup.find_all('script')[-1].string
 
 
 @pytest.mark.parametrize(['options', 'rendered'], [
@@ -223,6 +1323,94 @@ def test_custom_template(run_sphinx, tmpdir, options, rendered, get_template):
     assert text == rendered
 
 
+@pytest.mark.parametrize(['embed', 'files'], [
+    pytest.param(
+        False,
+        ['_static/redoc.js', '_specs/github.yml'],
+        id='link'),
+    pytest.param(
+        True,
+        ['_static/redoc.js', 'api/github/index.html'],
+        id='embed'),
+])
+def test_compressed_sidecars(run_sphinx, tmpdir, embed, files):
+    outdir = tmpdir.join('out')
+
+    run_sphinx(redoc_overwrite={'embed': embed}, redoc_compress=['gzip'])
+
+    manifest = json.loads(outdir.join('redoc-manifest.json').read())
+    for name in files:
+        name = manifest.get(name, name)
+        with gzip.open(outdir.join(name + '.gz').strpath, 'rb') as f:
+            assert f.read() == outdir.join(name).read_binary()
+
+
+def test_compressed_sidecars_are_up_to_date(run_sphinx, tmpdir):
+    sidecar = tmpdir.join('out', '_static', 'redoc.js.gz')
+
+    run_sphinx(redoc_compress=['gzip'])
+    inode = sidecar.stat().ino
+    run_sphinx(redoc_compress=['gzip'])
+
+    assert sidecar.stat().ino == inode
+
+
+@pytest.mark.parametrize(['buildername'], [
+    pytest.param('text', id='text'),
+    pytest.param('latex', id='latex'),
+])
+def test_compressed_sidecars_non_html(run_sphinx, tmpdir, buildername):
+    run_sphinx(redoc_compress=['gzip'], buildername=buildername)
+
+    assert not tmpdir.join('out', '_static', 'redoc.js.gz').check()
+
+
+def test_compressed_sidecars_brotli(run_sphinx, tmpdir):
+    brotli = pytest.importorskip('brotli')
+    redocjs = tmpdir.join('out', '_static', 'redoc.js')
+
+    run_sphinx(redoc_compress=['gzip', 'brotli'])
+
+    assert brotli.decompress(tmpdir.join('out', '_static', 'redoc.js.br')
+                             .read_binary()) == redocjs.read_binary()
+
+
+def test_custom_template_is_compiled_once(run_sphinx, tmpdir, monkeypatch):
+    template = tmpdir.mkdir('src', 'redoc').join('template.j2')
+    template.write_text(u'{{ name }}', encoding='utf-8')
+
+    compiled = []
+    compile_ = jinja2.Environment.compile
+
+    def compile(self, source, name=None, filename=None, *args, **kwargs):
+        if filename == template.strpath:
+            compiled.append(filename)
+        return compile_(self, source, name, filename, *args, **kwargs)
+    monkeypatch.setattr(jinja2.Environment, 'compile', compile)
+
+    def run():
+        run_sphinx(redoc=[
+            {'name': 'API %d' % i,
+             'page': 'api/%d' % i,
+             'spec': '_specs/github.yml',
+             'template': 'redoc/template.j2'}
+            for i in range(3)
+        ])
+
+    run()
+    assert compiled == [template.strpath]
+    assert tmpdir.join('out', 'api', '2.html').read() == 'API 2'
+
+    # Bytecode cache is persisted between builds, so the template does not
+    # need to be compiled again even though pages are rendered again.
+    for i in range(3):
+        tmpdir.join('out', 'api', '%d.html' % i).remove()
+    run()
+
+    assert compiled == [template.strpath]
+    assert tmpdir.join('out', 'api', '2.html').read() == 'API 2'
+
+
 def test_embedded_spec(run_sphinx, tmpdir):
     run_sphinx(redoc_overwrite={'embed': True})
 
@@ -237,6 +1425,767 @@ def test_embedded_spec(run_sphinx, tmpdir):
     assert json.loads(embedded_spec) == spec
 
 
+@pytest.mark.parametrize(['content'], [
+    pytest.param(u"""\
+        openapi: 3.0.0
+        info: {title: API, version: '1.0'}
+        x-anchored: &anchored
+          items: [1, 2.5, null, true, '2001-01-01']
+        x-aliased: *anchored
+        paths: {}
+    """, id='aliases'),
+    pytest.param(u"""\
+        openapi: 3.0.0
+        info: &info {title: API, version: '1.0'}
+        x-merged:
+          <<: *info
+          title: Merged
+        paths: {}
+    """, id='merge-keys'),
+])
+def test_embedded_spec_yaml_features(run_sphinx, tmpdir, content):
+    tmpdir.join('src', '_specs', 'github.yml').write_text(
+        textwrap.dedent(content), encoding='utf-8')
+    run_sphinx(redoc_overwrite={'embed': True})
+
+    html = tmpdir.join('out').join('api', 'github', 'index.html').read()
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+
+    embedded_spec = soup.find(id='spec').string
+    spec = yaml.safe_load(textwrap.dedent(content))
+    assert json.loads(embedded_spec) == spec
+
+
+@pytest.mark.parametrize('parser', ['auto', 'json', 'libyaml', 'yaml'])
+def test_embedded_spec_parser(run_sphinx, tmpdir, parser):
+    spec = tmpdir.join('src', '_specs', 'github.yml')
+    with io.open(spec.strpath, encoding='utf-8') as f:
+        spec = yaml.safe_load(f)
+    tmpdir.join('src', '_specs', 'github.json').write(json.dumps(spec))
+
+    run_sphinx(
+        redoc_overwrite={'embed': True, 'spec': '_specs/github.json'},
+        redoc_parser=parser)
+
+    html = tmpdir.join('out').join('api', 'github', 'index.html').read()
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    assert json.loads(soup.find(id='spec').string) == spec
+
+
+def test_embedded_spec_parser_json_fallback(run_sphinx, tmpdir):
+    spec = tmpdir.join('src', '_specs', 'github.yml')
+    spec.copy(tmpdir.join('src', '_specs', 'github.json'))
+
+    run_sphinx(redoc_overwrite={'embed': True, 'spec': '_specs/github.json'})
+
+    html = tmpdir.join('out').join('api', 'github', 'index.html').read()
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    with io.open(spec.strpath, encoding='utf-8') as f:
+        assert json.loads(soup.find(id='spec').string) == yaml.safe_load(f)
+
+
+def test_embedded_spec_parser_json_forced(run_sphinx):
+    with pytest.raises(ValueError) as excinfo:
+        run_sphinx(redoc_overwrite={'embed': True}, redoc_parser='json')
+
+    assert str(excinfo.value).startswith(
+        "Cannot parse spec '_specs/github.yml'")
+
+
+@pytest.mark.parametrize('missing', [False, True])
+def test_embedded_spec_serializer(run_sphinx, tmpdir, monkeypatch, missing):
+    if missing:
+        monkeypatch.setitem(sys.modules, 'orjson', None)
+    else:
+        pytest.importorskip('orjson')
+
+    run_sphinx(
+        redoc_overwrite={'embed': True, 'payload': {'compact': True}},
+        redoc_serializer='orjson')
+
+    html = tmpdir.join('out').join('api', 'github', 'index.html').read()
+    spec = tmpdir.join('src', '_specs', 'github.yml').strpath
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+
+    with io.open(spec, encoding='utf-8') as f:
+        spec = yaml.safe_load(f)
+
+    embedded_spec = soup.find(id='spec').string.strip()
+    assert '</' not in embedded_spec
+    assert json.loads(embedded_spec) == spec
+
+
+@pytest.mark.parametrize('option', ['redoc_parser', 'redoc_serializer'])
+def test_embedded_spec_backend_validation(run_sphinx, option):
+    with pytest.raises(ValueError) as excinfo:
+        run_sphinx(**{option: 'fast'})
+
+    assert str(excinfo.value) == (
+        'Improper configuration for sphinxcontrib-redoc at %s: '
+        "'fast' is not one of " % option) + (
+            'auto, json, libyaml, yaml' if option == 'redoc_parser'
+            else 'json, orjson')
+
+
+def test_embedded_spec_memory(run_sphinx, tmpdir):
+    spec = tmpdir.join('src', '_specs', 'github.yml')
+    spec.write_text(yaml.safe_dump({
+        'openapi': '3.0.0',
+        'info': {'title': 'API', 'version': '1.0'},
+        'paths': dict(
+            ('/things/%d' % i, {'get': {
+                'summary': 'Thing %d' % i,
+                'responses': {'200': {'description': 'OK'}}}})
+            for i in range(1000)),
+    }), encoding='utf-8')
+
+    def peak(conf):
+        tracemalloc.start()
+        try:
+            run_sphinx(redoc_overwrite=conf)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    # The spec is converted on the fly, so embedding the spec takes nearly
+    # as much memory as linking it, while loading the spec takes an order of
+    # magnitude more memory than the spec size. The first build is not
+    # measured, since Sphinx itself takes a lot of memory to read sources.
+    run_sphinx()
+    tmpdir.join('out', 'api', 'github', 'index.html').remove()
+
+    linked = peak({'embed': False})
+    embedded = peak({'embed': True})
+
+    assert embedded - linked < spec.size() // 2
+
+
+@pytest.mark.parametrize(['payload'], [
+    pytest.param({'compact': False}, id='not-compact'),
+    pytest.param({'compact': True}, id='compact'),
+    pytest.param({'gzip': True}, id='gzip'),
+    pytest.param({'compact': True, 'gzip': True}, id='compact-gzip'),
+])
+def test_embedded_spec_payload(run_sphinx, tmpdir, payload):
+    status = run_sphinx(redoc_overwrite={'embed': True, 'payload': payload})
+
+    html = tmpdir.join('out').join('api', 'github', 'index.html').read()
+    spec = tmpdir.join('src', '_specs', 'github.yml').strpath
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+
+    with io.open(spec, encoding='utf-8') as f:
+        spec = yaml.safe_load(f)
+
+    embedded_spec = soup.find(id='spec').string.strip()
+    if payload.get('gzip'):
+        assert soup.find(id='spec').attrs['type'] == 'application/gzip+base64'
+        embedded_spec = gzip.GzipFile(
+            fileobj=io.BytesIO(base64.b64decode(embedded_spec))).read()
+        embedded_spec = embedded_spec.decode('utf-8')
+    if payload.get('compact'):
+        assert embedded_spec == json.dumps(
+            spec, separators=(',', ':')).replace('</', '<\\/')
+
+    assert json.loads(embedded_spec) == spec
+    assert 'bytes instead of' in status
+
+
+def test_embedded_spec_payload_is_reported_from_cache(run_sphinx, tmpdir):
+    conf = {'embed': True, 'payload': {'compact': True}}
+
+    run_sphinx(redoc_overwrite=conf)
+    tmpdir.join('out').join('api', 'github', 'index.html').remove()
+    status = run_sphinx(redoc_overwrite=conf)
+
+    assert 'bytes instead of' in status
+
+
+def test_embedded_spec_payload_strip(run_sphinx, tmpdir):
+    tmpdir.join('src', '_specs', 'github.yml').write_text(textwrap.dedent(u'''\
+        openapi: 3.0.0
+        x-internal: true
+        info:
+          title: API
+          x-logo:
+            url: logo.png
+        paths:
+          /users:
+            x-internal-owner: team
+            get:
+              x-internal-id: 42
+              responses:
+                default:
+                  description: Users
+                  headers:
+                    x-internal-header:
+                      schema:
+                        type: string
+                  content:
+                    application/json:
+                      schema:
+                        properties:
+                          x-internal-name:
+                            type: string
+                            example:
+                              x-internal: still here
+        '''), encoding='utf-8')
+
+    run_sphinx(redoc_overwrite={
+        'embed': True,
+        'payload': {'strip': ['x-internal*']},
+    })
+
+    html = tmpdir.join('out').join('api', 'github', 'index.html').read()
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+
+    header = {'schema': {'type': 'string'}}
+    schema = {'properties': {'x-internal-name': {
+        'type': 'string',
+        'example': {'x-internal': 'still here'},
+    }}}
+
+    assert json.loads(soup.find(id='spec').string) == {
+        'openapi': '3.0.0',
+        'info': {'title': 'API', 'x-logo': {'url': 'logo.png'}},
+        'paths': {'/users': {'get': {'responses': {'default': {
+            'description': 'Users',
+            'headers': {'x-internal-header': header},
+            'content': {'application/json': {'schema': schema}},
+        }}}}},
+    }
+
+
+def test_embedded_spec_is_cached(run_sphinx, tmpdir, monkeypatch):
+    cachedir = tmpdir.join('out', '.doctrees', 'redoc', 'specs')
+
+    run_sphinx(redoc_overwrite={'embed': True})
+    assert len(cachedir.listdir()) == 1
+
+    # Removing the rendered page forces the page to be rendered again.
+    tmpdir.join('out').join('api', 'github', 'index.html').remove()
+
+    # Second build must not parse the spec at all, since it hasn't been
+    # changed since the previous one.
+    def safe_load(*args, **kwargs):
+        raise AssertionError('spec must be loaded from cache')
+    monkeypatch.setattr(yaml, 'safe_load', safe_load)
+
+    run_sphinx(redoc_overwrite={'embed': True})
+
+    html = tmpdir.join('out').join('api', 'github', 'index.html').read()
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+
+    assert json.loads(soup.find(id='spec').string) \
+        == json.loads(cachedir.listdir()[0].read())
+
+
+def test_embedded_spec_cache_is_invalidated(run_sphinx, tmpdir):
+    cachedir = tmpdir.join('out', '.doctrees', 'redoc', 'specs')
+    spec = tmpdir.join('src', '_specs', 'github.yml')
+
+    run_sphinx(redoc_overwrite={'embed': True})
+    spec.write_text(u'openapi: 3.0.0\n', encoding='utf-8')
+    run_sphinx(redoc_overwrite={'embed': True})
+
+    html = tmpdir.join('out').join('api', 'github', 'index.html').read()
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+
+    assert json.loads(soup.find(id='spec').string) == {'openapi': '3.0.0'}
+    assert len(cachedir.listdir()) == 2
+
+
+def test_embedded_spec_cache_is_evicted(run_sphinx, tmpdir):
+    cachedir = tmpdir.join('out', '.doctrees', 'redoc', 'specs')
+    spec = tmpdir.join('src', '_specs', 'github.yml')
+
+    run_sphinx(redoc_overwrite={'embed': True})
+    spec.write_text(u'openapi: 3.0.0\n', encoding='utf-8')
+    run_sphinx(redoc_overwrite={'embed': True}, redoc_cache_size=1024)
+
+    # The least recently used entry (i.e. huge github spec) must be gone
+    # in order to fit the cache into the limit.
+    assert [f.read() for f in cachedir.listdir()] == ['{"openapi": "3.0.0"}']
+
+
+def test_embedded_spec_cache_is_disabled(run_sphinx, tmpdir):
+    run_sphinx(redoc_overwrite={'embed': True}, redoc_cache=False)
+
+    assert not tmpdir.join('out', '.doctrees', 'redoc', 'specs').check()
+    assert not tmpdir.join('out', '.doctrees', 'redoc', 'templates').check()
+
+
+@pytest.mark.parametrize(['parallel'], [
+    pytest.param(0, id='serial'),
+    pytest.param(2, id='sphinx-parallel'),
+])
+def test_embedded_specs_are_processed_in_parallel(run_sphinx, tmpdir,
+                                                  parallel):
+    for i in range(4):
+        tmpdir.join('src', '_specs', 'spec-%d.yml' % i).write_text(
+            u'openapi: 3.0.0\ninfo:\n  title: API %d\n' % i,
+            encoding='utf-8')
+
+    run_sphinx(
+        redoc=[
+            {'page': 'api/%d' % i,
+             'spec': '_specs/spec-%d.yml' % (i % 4),
+             'embed': True}
+            for i in range(8)
+        ],
+        redoc_parallel=3,
+        parallel=parallel,
+    )
+
+    for i in range(8):
+        html = tmpdir.join('out', 'api', '%d.html' % i).read()
+        soup = bs4.BeautifulSoup(html, 'html.parser')
+
+        assert json.loads(soup.find(id='spec').string) \
+            == {'openapi': '3.0.0', 'info': {'title': 'API %d' % (i % 4)}}
+
+
+def test_parallel_build(tmpdir):
+    src = tmpdir.mkdir('src')
+    spec = py.path.local(here).join('..', 'docs', '_specs', 'github.yml')
+    spec.copy(src.mkdir('_specs').join('github.yml'))
+
+    src.join('conf.py').write_text(u'', encoding='utf-8')
+    src.join('index.rst').write_text(
+        u'Index\n=====\n\n.. toctree::\n\n' + u''.join(
+            u'   doc-%d\n' % i for i in range(10)), encoding='utf-8')
+    for i in range(10):
+        src.join('doc-%d.rst' % i).write_text(
+            u'Document %d\n===========\n' % i, encoding='utf-8')
+
+    redoc = [
+        {'name': 'API %d' % i,
+         'page': 'api/%d' % i,
+         'spec': '_specs/github.yml',
+         'embed': i % 2 == 0,
+         'skeleton': i % 3 == 0}
+        for i in range(20)
+    ]
+    expected = json.loads(json.dumps(redoc))
+
+    # That's what '-j auto' stands for.
+    warning = io.StringIO()
+    app = Sphinx(
+        srcdir=src.strpath,
+        confdir=src.strpath,
+        outdir=tmpdir.join('out').strpath,
+        doctreedir=tmpdir.join('out', '.doctrees').strpath,
+        buildername='html',
+        confoverrides={
+            'extensions': ['sphinxcontrib.redoc'],
+            'redoc': redoc,
+        },
+        parallel=max(multiprocessing.cpu_count(), 2),
+        status=io.StringIO(),
+        warning=warning,
+    )
+    app.build()
+
+    assert app.builder.parallel_ok
+    assert 'doing serial' not in warning.getvalue()
+
+    # Rendering pages must leave the configuration untouched.
+    assert app.config.redoc == expected
+
+    for i in range(20):
+        html = tmpdir.join('out', 'api', '%d.html' % i).read()
+        soup = bs4.BeautifulSoup(html, 'html.parser')
+
+        assert soup.find('title').text == 'API %d' % i
+        assert (soup.find(id='spec') is not None) == (i % 2 == 0)
+        assert (soup.find(class_='redoc-outline') is not None) == (i % 3 == 0)
+
+
+def test_watch(tmpdir):
+    src = tmpdir.mkdir('src')
+    for name in ('foo', 'bar'):
+        src.join('%s.yml' % name).write_text(
+            u'openapi: 3.0.0\ninfo: {title: %s}\n' % name, encoding='utf-8')
+    src.join('conf.py').write_text(u'', encoding='utf-8')
+    src.join('index.rst').ensure()
+
+    redoc = [
+        {'page': 'foo', 'spec': 'foo.yml', 'embed': True},
+        {'page': 'bar', 'spec': 'bar.yml', 'embed': True},
+    ]
+    app = Sphinx(
+        srcdir=src.strpath,
+        confdir=src.strpath,
+        outdir=tmpdir.join('out').strpath,
+        doctreedir=tmpdir.join('out', '.doctrees').strpath,
+        buildername='html',
+        confoverrides={'extensions': ['sphinxcontrib.redoc'], 'redoc': redoc},
+        status=io.StringIO(),
+    )
+    app.build()
+
+    foo, bar = tmpdir.join('out', 'foo.html'), tmpdir.join('out', 'bar.html')
+    bar.write_text(u'sentinel', encoding='utf-8')
+
+    def change(title):
+        src.join('foo.yml').write_text(
+            u'openapi: 3.0.0\ninfo: {title: %s}\n' % title, encoding='utf-8')
+        for _ in range(100):
+            if title in foo.read():
+                break
+            time.sleep(0.05)
+
+        soup = bs4.BeautifulSoup(foo.read(), 'html.parser')
+        return json.loads(soup.find(id='spec').string)
+
+    stop = threading.Event()
+    watcher = threading.Thread(
+        target=extension.watch, args=(app,),
+        kwargs={'interval': 0.05, 'stop': stop})
+    watcher.start()
+    try:
+        # The spec is changed before, and after the watcher looks at it.
+        assert change('changed') == \
+            {'openapi': '3.0.0', 'info': {'title': 'changed'}}
+        assert change('changed-again') == \
+            {'openapi': '3.0.0', 'info': {'title': 'changed-again'}}
+    finally:
+        stop.set()
+        watcher.join()
+
+    # Pages whose files are unchanged are not rendered again.
+    assert bar.read() == 'sentinel'
+    assert app.config.redoc == [
+        {'page': 'foo', 'spec': 'foo.yml', 'embed': True},
+        {'page': 'bar', 'spec': 'bar.yml', 'embed': True},
+    ]
+
+
+def test_discovered_specs(run_sphinx, tmpdir):
+    specdir = tmpdir.join('src', '_specs', 'services')
+    for name in ('users', 'repos'):
+        specdir.ensure(dir=True).join('%s.yml' % name).write_text(
+            u'openapi: 3.0.0\ninfo: {title: %s}\n' % name, encoding='utf-8')
+    specdir.join('README.md').write_text(u'Services', encoding='utf-8')
+
+    run_sphinx(redoc=[
+        {'name': 'Github API (v3)',
+         'page': 'api/github/index',
+         'spec': '_specs/github.yml'},
+        {'name': '{name} service',
+         'page': 'api/services/{name}',
+         'specs': '_specs/services',
+         'embed': True,
+         'index': {'page': 'api/services/index', 'title': 'Services'}},
+    ])
+
+    for name in ('users', 'repos'):
+        html = tmpdir.join('out', 'api', 'services', '%s.html' % name).read()
+        soup = bs4.BeautifulSoup(html, 'html.parser')
+
+        assert soup.find('title').text == '%s service' % name
+        assert json.loads(soup.find(id='spec').string) == \
+            {'openapi': '3.0.0', 'info': {'title': name}}
+
+    assert not tmpdir.join('out', 'api', 'services', 'README.html').check()
+
+    html = tmpdir.join('out', 'api', 'services', 'index.html').read()
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    assert soup.find('h1').text == 'Services'
+    assert [(a['href'], a.text) for a in soup.find('ul').find_all('a')] == [
+        ('repos.html', 'repos service'),
+        ('users.html', 'users service'),
+    ]
+
+
+def test_discovered_specs_by_glob(run_sphinx, tmpdir):
+    for path in ('v1/users.yml', 'v2/users.yml', 'v2/users.txt'):
+        tmpdir.join('src', '_specs', path).write_text(
+            u'openapi: 3.0.0\ninfo: {title: %s}\n' % path,
+            encoding='utf-8', ensure=True)
+
+    run_sphinx(redoc=[
+        {'page': 'api/{path}', 'specs': '_specs/*/*.yml'},
+    ])
+
+    html = tmpdir.join('out', 'api', 'v1', 'users.html').read()
+    assert bs4.BeautifulSoup(html, 'html.parser').find('title').text == \
+        'users'
+    assert tmpdir.join('out', 'api', 'v2', 'users.html').check()
+    assert _stored(tmpdir, '_specs/users.yml').check()
+    assert not tmpdir.join('out', 'api', 'v2', 'users.txt').check()
+
+
+def test_discovered_specs_are_not_read_again(run_sphinx, tmpdir,
+                                             monkeypatch):
+    opened = []
+
+    class RecordingIO(object):
+        def __getattr__(self, name):
+            return getattr(io, name)
+
+        def open(self, path, *args, **kwargs):
+            opened.append(os.path.basename(path))
+            return io.open(path, *args, **kwargs)
+
+    monkeypatch.setattr(extension, 'io', RecordingIO())
+    conf = [{'page': 'api/{name}', 'specs': '_specs/*.yml'}]
+
+    run_sphinx(redoc=conf)
+    assert 'github.yml' in opened
+
+    del opened[:]
+    status = run_sphinx(redoc=conf)
+    assert '1 of 1 page(s) are up to date' in status
+    assert 'github.yml' not in opened
+
+
+@pytest.mark.parametrize(['conf', 'error'], [
+    pytest.param(
+        {'page': 'api'},
+        'Improper configuration for sphinxcontrib-redoc at 0: either spec '
+        'or specs is required',
+        id='no-spec'),
+    pytest.param(
+        {'page': 'api', 'spec': 'a.yml', 'specs': '*.yml'},
+        'Improper configuration for sphinxcontrib-redoc at 0: either spec '
+        'or specs is required',
+        id='spec-and-specs'),
+    pytest.param(
+        {'page': 'api', 'spec': 'a.yml', 'index': {'page': 'apis'}},
+        'Improper configuration for sphinxcontrib-redoc at 0.index: index '
+        'is supported along with specs only',
+        id='index-without-specs'),
+    pytest.param(
+        {'page': 'api', 'specs': '_specs/*.yml'},
+        "Improper configuration for sphinxcontrib-redoc: page 'api' is "
+        "configured more than once",
+        id='same-page'),
+])
+def test_discovered_specs_validation(run_sphinx, tmpdir, conf, error):
+    tmpdir.join('src', '_specs', 'other.yml').write_text(
+        u'openapi: 3.0.0\n', encoding='utf-8')
+
+    with pytest.raises(Exception) as excinfo:
+        run_sphinx(redoc=[conf])
+    assert error == str(excinfo.value)
+
+
+_DIRECTIVE_SPEC = textwrap.dedent(u'''\
+    openapi: 3.0.0
+    info: {title: Users API, version: '1.0'}
+    tags: [{name: users}, {name: repos}]
+    paths:
+      /users:
+        get: {tags: [users], operationId: listUsers}
+      /repos:
+        get: {tags: [repos], operationId: listRepos}
+    ''')
+
+
+def test_directive(run_sphinx, tmpdir):
+    src = tmpdir.join('src')
+    src.join('_specs', 'users.yml').write_text(
+        _DIRECTIVE_SPEC, encoding='utf-8')
+    src.join('users.rst').write_text(textwrap.dedent(u'''\
+        Users
+        =====
+
+        .. redoc:: _specs/users.yml
+           :name: Users API
+           :height: 800
+
+        .. redoc:: /_specs/users.yml
+           :name: Users API
+           :tag: users
+        '''), encoding='utf-8')
+    src.join('guide', 'repos.rst').write_text(textwrap.dedent(u'''\
+        Repos
+        =====
+
+        .. redoc:: ../_specs/users.yml
+           :name: Users API
+           :height: 800
+
+        .. redoc:: ../_specs/users.yml
+           :name: Users API
+           :tag: repos
+           :embed:
+        '''), encoding='utf-8', ensure=True)
+
+    run_sphinx(redoc=[])
+
+    def frames(docname):
+        html = tmpdir.join('out', docname + '.html').read()
+        return bs4.BeautifulSoup(html, 'html.parser').find_all(
+            'iframe', class_='redoc')
+
+    users, repos = frames('users'), frames('guide/repos')
+    assert users[0]['style'] == 'width: 100%; height: 800px; border: 0'
+    assert users[1]['style'] == 'width: 100%; height: 600px; border: 0'
+    assert users[0]['title'] == 'Users API'
+
+    # The very same spec rendered the very same way is rendered once.
+    assert users[0]['src'] == repos[0]['src'][len('../'):]
+    assert len(set(frame['src'] for frame in users + repos)) == 4
+    assert len(tmpdir.join('out', '_redoc').listdir()) == 3
+
+    html = tmpdir.join('out', users[0]['src']).read()
+    assert 'var spec = "../%s";' % _stored(
+        tmpdir, '_specs/users.yml').relto(tmpdir.join('out')) in html
+
+    html = tmpdir.join('out', users[1]['src']).read()
+    filtered = _stored(tmpdir, '_specs/users.%s.json' % hashlib.sha256(
+        b'{"include": {"tags": ["users"]}}').hexdigest()[:8])
+    assert 'var spec = "../%s";' % filtered.relto(tmpdir.join('out')) in html
+    spec = json.loads(filtered.read())
+    assert list(spec['paths']) == ['/users']
+    assert spec['tags'] == [{'name': 'users'}]
+
+    html = tmpdir.join('out', 'guide', repos[1]['src']).read()
+    spec = json.loads(
+        bs4.BeautifulSoup(html, 'html.parser').find(id='spec').string)
+    assert list(spec['paths']) == ['/repos']
+
+
+def test_directive_tag_external(run_sphinx, tmpdir):
+    tmpdir.join('src', 'users.rst').write_text(textwrap.dedent(u'''\
+        Users
+        =====
+
+        .. redoc:: https://example.com/users.yml
+           :tag: users
+        '''), encoding='utf-8')
+
+    run_sphinx(redoc=[], keep_warnings=True)
+
+    html = tmpdir.join('out', 'users.html').read()
+    assert 'supported for external specs along with redoc_fetch only' in html
+    assert not tmpdir.join('out', '_redoc').check()
+
+
+def test_directive_dependency(run_sphinx, tmpdir):
+    src = tmpdir.join('src')
+    for name in ('users', 'repos'):
+        src.join('_specs', '%s.yml' % name).write_text(
+            _DIRECTIVE_SPEC, encoding='utf-8')
+        src.join('%s.rst' % name).write_text(
+            u'%s\n=====\n\n.. redoc:: _specs/%s.yml\n' % (name, name),
+            encoding='utf-8')
+
+    run_sphinx(redoc=[])
+    src.join('_specs', 'users.yml').write_text(
+        _DIRECTIVE_SPEC.replace(u'Users API', u'Changed API'),
+        encoding='utf-8')
+    status = run_sphinx(redoc=[])
+
+    # Only the document that uses the spec is read again.
+    assert '0 added, 1 changed, 0 removed' in status
+    assert '1 of 2 page(s) are up to date' in status
+    assert 'Changed API' in _stored(tmpdir, '_specs/users.yml').read()
+
+
+@pytest.mark.parametrize(['options'], [
+    pytest.param({'freshenv': True}, id='fresh-env'),
+    pytest.param({'force_all': True}, id='force-all'),
+])
+def test_unchanged_page_is_rendered_when_forced(run_sphinx, tmpdir, options):
+    page = tmpdir.join('out', 'api', 'github', 'index.html')
+
+    run_sphinx()
+    page.write_text(u'sentinel', encoding='utf-8')
+    status = run_sphinx(**options)
+
+    assert page.read() != 'sentinel'
+    assert 'up to date' not in status
+
+    # Subsequent builds skip the page as usual.
+    page.write_text(u'sentinel', encoding='utf-8')
+    run_sphinx()
+    assert page.read() == 'sentinel'
+
+
+def test_changed_spec_named_like_url_is_rendered(run_sphinx, tmpdir):
+    spec = tmpdir.join('src', 'httpbin.yml')
+    page = tmpdir.join('out', 'api', 'github', 'index.html')
+    conf = {'spec': 'httpbin.yml', 'embed': True}
+
+    spec.write_text(u'info: {title: One}\n', encoding='utf-8')
+    run_sphinx(redoc_overwrite=conf)
+    spec.write_text(u'info: {title: Two}\n', encoding='utf-8')
+    run_sphinx(redoc_overwrite=conf)
+
+    assert 'Two' in page.read()
+
+
+def test_unchanged_page_is_skipped(run_sphinx, tmpdir):
+    page = tmpdir.join('out', 'api', 'github', 'index.html')
+
+    run_sphinx()
+    spec = _stored(tmpdir, '_specs/github.yml')
+    page.write_text(u'sentinel', encoding='utf-8')
+    spec.write_text(u'sentinel', encoding='utf-8')
+    run_sphinx()
+
+    assert page.read() == 'sentinel'
+    assert spec.read() == 'sentinel'
+
+
+def test_changed_spec_is_skipped_afterwards(run_sphinx, tmpdir):
+    page = tmpdir.join('out', 'api', 'github', 'index.html')
+
+    run_sphinx()
+    tmpdir.join('src', '_specs', 'github.yml').write_text(
+        u'openapi: 3.0.0\n', encoding='utf-8')
+    run_sphinx()
+
+    # The spec is changed while documents are not, which means Sphinx does
+    # not pickle the environment. Nevertheless, the page must be skipped.
+    page.write_text(u'sentinel', encoding='utf-8')
+    status = run_sphinx()
+
+    assert page.read() == 'sentinel'
+    assert '1 of 1 page(s) are up to date, skipped' in status
+
+
+@pytest.mark.parametrize(['change'], [
+    pytest.param(
+        lambda tmpdir: tmpdir.join('src', '_specs', 'github.yml').write_text(
+            u'openapi: 3.0.0\n', encoding='utf-8'),
+        id='spec'),
+    pytest.param(
+        lambda tmpdir: tmpdir.join('out', 'api', 'github', 'index.html')
+        .remove(),
+        id='page-removed'),
+    pytest.param(
+        lambda tmpdir: _stored(tmpdir, '_specs/github.yml').remove(),
+        id='spec-removed'),
+])
+def test_changed_page_is_rendered(run_sphinx, tmpdir, change):
+    page = tmpdir.join('out', 'api', 'github', 'index.html')
+
+    run_sphinx()
+    page.write_text(u'sentinel', encoding='utf-8')
+    change(tmpdir)
+    run_sphinx()
+
+    assert page.read() != 'sentinel'
+
+
+@pytest.mark.parametrize(['redoc_overwrite'], [
+    pytest.param({'opts': {'lazy-rendering': True}}, id='opts'),
+    pytest.param({'embed': True}, id='embed'),
+    pytest.param({'name': 'GitHub'}, id='name'),
+])
+def test_reconfigured_page_is_rendered(run_sphinx, tmpdir, redoc_overwrite):
+    page = tmpdir.join('out', 'api', 'github', 'index.html')
+
+    run_sphinx()
+    page.write_text(u'sentinel', encoding='utf-8')
+    run_sphinx(redoc_overwrite=redoc_overwrite)
+
+    assert page.read() != 'sentinel'
+
+
 @pytest.mark.parametrize(['conf', 'error'], [
     pytest.param(
         {'spec': 42},
@@ -406,6 +2355,24 @@ def test_embedded_spec(run_sphinx, tmpdir):
         ),
         id='expand-responses-int-array'),
 
+    pytest.param(
+        {'filter': {'include': {'operations': ['listUsers']}}},
+        (
+            "Improper configuration for sphinxcontrib-redoc at "
+            "0.filter.include: Additional properties are not allowed "
+            "('operations' was unexpected)"
+        ),
+        id='filter-unknown'),
+
+    pytest.param(
+        {'filter': {'exclude': {'extensions': {'audience': 'internal'}}}},
+        (
+            "Improper configuration for sphinxcontrib-redoc at "
+            "0.filter.exclude.extensions: 'audience' does not match any "
+            "of the regexes: '^x-'"
+        ),
+        id='filter-extensions-not-vendor'),
+
     pytest.param(
         {'opts': {'expand-responses': '200'}},
         (